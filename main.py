@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
 import sqlite3
 from discord import app_commands
 from discord import Embed, Color, SelectOption
@@ -9,7 +9,17 @@ from typing import Optional, Literal
 from discord.ui import View, Button, Select
 import json
 import time
-from contextlib import contextmanager
+import queue
+import threading
+import asyncio
+import functools
+import bisect
+import heapq
+from collections import OrderedDict, namedtuple, deque
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager, asynccontextmanager
+import weakref
 
 # Bot setup
 intents = discord.Intents.default()
@@ -18,17 +28,1139 @@ intents.members = True
 intents.guilds = True
 bot = commands.Bot(command_prefix='/', intents=intents)
 
-# Store user balances and cooldowns
-class BankSystem:
+class ConnectionPool:
+    """Bounded pool of SQLite connections that are configured once and reused
+    
+    Both waits are kept short (busy_timeout for SQLite locks, timeout for a free pooled
+    connection) so contention surfaces quickly and RetryPolicy does the backing off.
+    """
+    def __init__(self, database: str, max_size: int = 5, timeout: float = 0.1,
+                 busy_timeout: float = 0.1, health_check_interval: float = 30.0):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.health_check_interval = health_check_interval
+        
+        # Idle connections with the time they were last returned (most recent first)
+        self._idle = queue.LifoQueue()
+        # Caps the number of connections that exist at the same time
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def create_connection(self):
+        """Open a new connection and apply the per-connection PRAGMAs once"""
+        # Connections are handed between the DB worker threads, one at a time
+        conn = sqlite3.connect(self.database, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def is_healthy(self, conn) -> bool:
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return not conn.in_transaction
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Take an idle connection (health-checking stale ones) or open a new one"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError("Timed out waiting for a free database connection")
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self.create_connection()
+                
+                if time.monotonic() - last_used < self.health_check_interval or self.is_healthy(conn):
+                    return conn
+                self.discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken: bool = False):
+        """Return a connection to the pool, or close it if it can't be reused"""
+        try:
+            if broken or conn.in_transaction:
+                self.discard(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except:
+            pass
+
+class RetryPolicy:
+    """Retries database calls that hit lock contention, with jittered exponential backoff
+    
+    Each query class ('read', 'write', ...) has its own budget of attempts and a total
+    deadline. Lock waits are short (see ConnectionPool), so the deadline is what normally
+    ends the retries; the attempt cap is only a backstop. Only contention errors (database locked/busy, no free pooled connection)
+    are retried; everything else is raised straight away. The async path sleeps with
+    asyncio.sleep so a retry never blocks the event loop.
+    """
+    BUDGETS = {
+        'read': (20, 5.0),     # (max attempts, deadline in seconds)
+        'write': (30, 10.0),
+    }
+
+    def __init__(self, base_delay: float = 0.05, max_delay: float = 2.0, budgets: dict = None):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budgets = dict(self.BUDGETS, **(budgets or {}))
+        
+        self.calls = 0
+        self.contention_errors = 0  # lock/busy errors seen, including ones later retried away
+        self.retries = 0
+        self.gave_up = 0
+
+    @staticmethod
+    def is_contention(error: Exception) -> bool:
+        if not isinstance(error, sqlite3.OperationalError):
+            return False
+        message = str(error).lower()
+        return 'locked' in message or 'busy' in message or 'free database connection' in message
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: a random delay up to the capped exponential step"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _should_retry(self, query_class: str, error: Exception, attempt: int, started: float) -> float:
+        """Return the delay before the next attempt, or None to give up"""
+        if not self.is_contention(error):
+            return None
+        self.contention_errors += 1
+        max_attempts, deadline = self.budgets.get(query_class, self.budgets['read'])
+        delay = self.backoff(attempt)
+        if attempt + 1 >= max_attempts or time.monotonic() + delay - started > deadline:
+            self.gave_up += 1
+            print(f"Giving up on {query_class} query after {attempt + 1} attempt(s): {error}")
+            return None
+        self.retries += 1
+        return delay
+
+    async def run(self, query_class: str, make_call):
+        """Await make_call() (a fresh awaitable per attempt) until it succeeds or the budget runs out"""
+        self.calls += 1
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return await make_call()
+            except Exception as e:
+                delay = self._should_retry(query_class, e, attempt, started)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def run_sync(self, query_class: str, func, *args, **kwargs):
+        """Blocking version of run for code that is already off the event loop"""
+        self.calls += 1
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(query_class, e, attempt, started)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+class GroupCommitWriter:
+    """Single writer thread that drains queued write intents and commits them in batches
+    
+    SQLite only allows one writer at a time, so instead of every caller taking its own
+    write transaction, callers submit an intent (a function that takes a cursor) and get
+    a future that resolves once the batch holding it has been committed.
+    """
+    def __init__(self, connection_factory, max_batch_size: int = 64, max_batch_delay: float = 0.002,
+                 retry: RetryPolicy = None):
+        self.connection_factory = connection_factory
+        self.retry = retry or RetryPolicy()
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        
+        self._queue = queue.Queue()
+        self._after_commit = []  # callbacks registered by intents of the open batch
+        self._thread = threading.Thread(target=self._run, name='bank-db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        """Queue a write intent; func is called as func(cursor, *args, **kwargs)"""
+        future = Future()
+        self._queue.put((lambda c: func(c, *args, **kwargs), future))
+        return future
+
+    def execute(self, func, *args, **kwargs):
+        """Queue a write intent and block until it has been committed (retried on contention)"""
+        return self.retry.run_sync('write', lambda: self.submit(func, *args, **kwargs).result())
+
+    def after_commit(self, callback):
+        """Call from inside an intent: run callback() once its batch has committed
+        
+        Callbacks run on the writer thread, before the batch's futures resolve. They are
+        dropped if the intent fails or the batch rolls back.
+        """
+        self._after_commit.append(callback)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_batch_delay
+        while len(batch) < self.max_batch_size:
+            try:
+                # Take whatever piled up while the last batch committed, then give
+                # stragglers a short window to join before closing the batch
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return batch
+
+    def _run(self):
+        conn = self.connection_factory()
+        conn.isolation_level = None  # Transactions are managed explicitly per batch
+        while True:
+            batch = [(func, future) for func, future in self._next_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                outcomes = self._commit_batch(conn, batch)
+            except Exception as e:
+                print(f"Error committing write batch: {e}")
+                self._after_commit.clear()
+                try:
+                    conn.execute('ROLLBACK')
+                except sqlite3.Error:
+                    pass
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            callbacks, self._after_commit = self._after_commit, []
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Error in after-commit callback: {e}")
+            
+            # Only resolve futures once the whole batch is durable
+            for future, ok, value in outcomes:
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _commit_batch(self, conn, batch) -> list:
+        c = conn.cursor()
+        c.execute('BEGIN IMMEDIATE')
+        outcomes = []
+        for func, future in batch:
+            # Each intent gets a savepoint so one failure doesn't sink the batch
+            c.execute('SAVEPOINT intent')
+            callbacks_before = len(self._after_commit)
+            try:
+                result = func(c)
+            except Exception as e:
+                del self._after_commit[callbacks_before:]
+                c.execute('ROLLBACK TO intent')
+                c.execute('RELEASE intent')
+                outcomes.append((future, False, e))
+            else:
+                c.execute('RELEASE intent')
+                outcomes.append((future, True, result))
+        c.execute('COMMIT')
+        return outcomes
+
+class AutocompleteIndex:
+    """Case-folded prefix and substring index for autocomplete choices
+    
+    Entries are kept sorted by their folded text so prefix matches come from a binary
+    search; substring matches are only looked for when prefixes don't fill the reply.
+    Results are (label, value) pairs ranked exact match, prefix, then substring.
+    """
+    def __init__(self, max_results: int = 25, cache_size: int = 256):
+        self.max_results = max_results
+        self.cache_size = cache_size
+        
+        self._lock = threading.Lock()
+        self._entries = {}  # value -> (folded text, label)
+        self._sorted = []   # (folded text, value), sorted
+        # Recent (user, query) -> results; cleared whenever the index changes
+        self._cache = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, value: str, text: str, label: str = None):
+        with self._lock:
+            self._discard(value)
+            folded = text.casefold()
+            self._entries[value] = (folded, label or text)
+            bisect.insort(self._sorted, (folded, value))
+            self._cache.clear()
+
+    def remove(self, value: str):
+        with self._lock:
+            if self._discard(value):
+                self._cache.clear()
+
+    def _discard(self, value: str) -> bool:
+        entry = self._entries.pop(value, None)
+        if entry is None:
+            return False
+        i = bisect.bisect_left(self._sorted, (entry[0], value))
+        del self._sorted[i]
+        return True
+
+    def search(self, query: str, user_id=None, limit: int = None) -> list:
+        limit = limit or self.max_results
+        folded = query.casefold().strip()
+        key = (user_id, folded, limit)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            
+            exact, prefixed = [], []
+            i = bisect.bisect_left(self._sorted, (folded,))
+            while i < len(self._sorted) and len(exact) + len(prefixed) < limit:
+                text, value = self._sorted[i]
+                if not text.startswith(folded):
+                    break
+                (exact if text == folded else prefixed).append(value)
+                i += 1
+            matches = exact + prefixed
+            
+            if len(matches) < limit and folded:
+                for text, value in self._sorted:
+                    if folded in text and not text.startswith(folded):
+                        matches.append(value)
+                        if len(matches) >= limit:
+                            break
+            
+            results = [(self._entries[value][1], value) for value in matches]
+            self._cache[key] = results
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return results
+
+class ShopCatalogCache:
+    """In-memory copy of the active shop catalog
+    
+    Loaded once at startup and then kept current by the code paths that change the
+    catalog (adding or removing items), so browsing the shop never touches SQLite.
+    Item rows are (id, name, price, description, required_role, price_text).
+    Category names and each category's item names are also kept in AutocompleteIndex
+    instances that are updated incrementally alongside the cache.
+    """
+    DEFAULT_CATEGORIES = ('Wands', 'Brooms', 'Accessories')
+
+    def __init__(self, loader, price_formatter):
+        self.loader = loader
+        self.price_formatter = price_formatter
+        
+        self._lock = threading.Lock()
+        self._items = {}        # item id -> item details dict
+        self._by_category = {}  # category -> item rows sorted by price
+        self.category_index = AutocompleteIndex()
+        self._item_indexes = {}  # category -> AutocompleteIndex of item names
+        self.reload()
+
+    def reload(self):
+        """Rebuild the whole cache from the database"""
+        items = {}
+        for row in self.loader():
+            item = dict(row)
+            items[item['id']] = item
+        with self._lock:
+            self._items = items
+            self._by_category = {}
+            self.category_index = AutocompleteIndex()
+            self._item_indexes = {}
+            for category in {item['category'] for item in items.values()}:
+                self._rebuild_category(category)
+            for item in items.values():
+                self._index_item(item)
+
+    def _rebuild_category(self, category: str):
+        rows = [self._row(item) for item in self._items.values() if item['category'] == category]
+        if rows:
+            rows.sort(key=lambda row: (row[2], row[1]))
+            if category not in self._by_category:
+                self.category_index.add(category, category)
+            self._by_category[category] = rows
+        elif self._by_category.pop(category, None) is not None:
+            self.category_index.remove(category)
+            self._item_indexes.pop(category, None)
+
+    def _index_item(self, item: dict):
+        index = self._item_indexes.setdefault(item['category'], AutocompleteIndex())
+        index.add(str(item['id']), item['name'],
+                  f"{item['name']} ({self.price_formatter(item['price'])})")
+
+    def _row(self, item: dict) -> tuple:
+        return (item['id'], item['name'], item['price'], item['description'],
+                item['required_role'], self.price_formatter(item['price']))
+
+    def categories(self) -> list:
+        """(category, item count) pairs, sorted by category"""
+        with self._lock:
+            return [(category, len(rows)) for category, rows in sorted(self._by_category.items())]
+
+    def category_names(self, exclude_defaults: bool = False) -> list:
+        with self._lock:
+            names = sorted(self._by_category)
+        if exclude_defaults:
+            names = [name for name in names if name not in self.DEFAULT_CATEGORIES]
+        return names
+
+    def items(self, category: str, order_by: str = 'price') -> list:
+        with self._lock:
+            rows = list(self._by_category.get(category, ()))
+        if order_by == 'name':
+            rows.sort(key=lambda row: row[1])
+        return rows
+
+    def get(self, item_id: int) -> dict:
+        with self._lock:
+            item = self._items.get(item_id)
+            return dict(item) if item else None
+
+    def item_added(self, item: dict):
+        """Record a committed insert; only the item's category is rebuilt"""
+        with self._lock:
+            self._items[item['id']] = dict(item)
+            self._rebuild_category(item['category'])
+            self._index_item(item)
+
+    def item_removed(self, item_id: int):
+        """Record a committed removal; only the item's category is rebuilt"""
+        with self._lock:
+            item = self._items.pop(item_id, None)
+            if item:
+                index = self._item_indexes.get(item['category'])
+                if index is not None:
+                    index.remove(str(item_id))
+                self._rebuild_category(item['category'])
+
+    def complete_categories(self, query: str, user_id=None, exclude_defaults: bool = False) -> list:
+        """Autocomplete (label, value) pairs for category names"""
+        if not exclude_defaults:
+            return self.category_index.search(query, user_id)
+        limit = self.category_index.max_results
+        results = self.category_index.search(query, user_id, limit + len(self.DEFAULT_CATEGORIES))
+        return [result for result in results if result[1] not in self.DEFAULT_CATEGORIES][:limit]
+
+    def complete_items(self, category: str, query: str, user_id=None) -> list:
+        """Autocomplete (label, value) pairs for item names in one category; values are item ids"""
+        index = self._item_indexes.get(category)
+        return index.search(query, user_id) if index is not None else []
+
+class RoleTables:
+    """Role-based config compiled once into frozen lookup tables
+    
+    Reward tables map int role ids to (knut value, config) so picking a member's best
+    role is a set intersection over their role ids; permission roles are frozensets.
+    Config keys may be ints or strings, both are normalised to int role ids.
+    """
+    HOUSES = ('gryffindor', 'slytherin', 'ravenclaw', 'hufflepuff')
+
+    def __init__(self, config: dict, knuts_per_unit: dict):
+        def compile_rewards(roles: dict, value_key: str):
+            return MappingProxyType({
+                int(role_id): (role_config[value_key] * knuts_per_unit.get(role_config['currency'], 1),
+                               MappingProxyType(dict(role_config)))
+                for role_id, role_config in roles.items()
+            })
+        
+        # Work tiers are ranked by their maximum payout, income tiers by their amount
+        self.work_roles = compile_rewards(config.get('work_roles', {}), 'max')
+        self.income_roles = compile_rewards(config.get('income_roles', {}), 'amount')
+        self.default_work = MappingProxyType(dict(config['default_work']))
+        self.default_work_knuts = (config['default_work']['max'] *
+                                   knuts_per_unit.get(config['default_work']['currency'], 1))
+        self.default_income = MappingProxyType(dict(config['default_income']))
+        self.default_income_knuts = (config['default_income']['amount'] *
+                                     knuts_per_unit.get(config['default_income']['currency'], 1))
+        self._work_ids = frozenset(self.work_roles)
+        self._income_ids = frozenset(self.income_roles)
+        
+        self.bankers = frozenset(int(role_id) for role_id in config.get('banker_roles', []))
+        self.shop_managers = frozenset(int(role_id) for role_id in config.get('shop_manager_roles', []))
+        house_roles = config.get('house_roles', {})
+        self.houses = MappingProxyType({int(house_roles[house]): house
+                                        for house in self.HOUSES if house in house_roles})
+
+    @staticmethod
+    def role_ids(member) -> set:
+        return {role.id for role in getattr(member, 'roles', ())}
+
+    def _best(self, table, ids: frozenset, role_ids: set):
+        matched = ids.intersection(role_ids)
+        if not matched:
+            return None, None, None
+        role_id = max(matched, key=lambda rid: table[rid][0])
+        knuts, role_config = table[role_id]
+        return role_id, role_config, knuts
+
+    def work_tier(self, member, role_ids: set = None) -> tuple:
+        """(role id, config, max knuts) of the best work role; default_work unless a role pays more"""
+        role_id, role_config, knuts = self._best(self.work_roles, self._work_ids,
+                                                 role_ids if role_ids is not None else self.role_ids(member))
+        if role_id is None or knuts <= self.default_work_knuts:
+            return None, self.default_work, self.default_work_knuts
+        return role_id, role_config, knuts
+
+    def income_tier(self, member, role_ids: set = None) -> tuple:
+        """(role id, config, knuts) of the best income role, or (None, default config, knuts)"""
+        role_id, role_config, knuts = self._best(self.income_roles, self._income_ids,
+                                                 role_ids if role_ids is not None else self.role_ids(member))
+        if role_id is None:
+            return None, self.default_income, self.default_income_knuts
+        return role_id, role_config, knuts
+
+    def house(self, member, role_ids: set = None) -> str:
+        """Lower-case house key from house_roles, or None if unsorted"""
+        for role_id in (role_ids if role_ids is not None else self.role_ids(member)):
+            if role_id in self.houses:
+                return self.houses[role_id]
+        return None
+
+    def is_banker(self, member, role_ids: set = None) -> bool:
+        return not self.bankers.isdisjoint(role_ids if role_ids is not None else self.role_ids(member))
+
+    def is_shop_manager(self, member, role_ids: set = None) -> bool:
+        return not self.shop_managers.isdisjoint(role_ids if role_ids is not None else self.role_ids(member))
+
+MemberTier = namedtuple('MemberTier', ['work_role_id', 'work_config', 'income_role_id', 'income_config',
+                                       'income_knuts', 'house', 'is_banker', 'is_shop_manager', 'role_ids'])
+
+class MemberTierCache:
+    """Resolved role attributes per (guild id, member id)
+    
+    Entries are refreshed from on_member_update / on_member_join and dropped on
+    on_member_remove; a miss resolves the member's roles on the spot. A reverse index
+    lists the members whose best income role is a given role.
+    """
+    def __init__(self, roles: RoleTables):
+        self.roles = roles
+        self._tiers = {}           # (guild id, member id) -> MemberTier
+        self._by_income_role = {}  # (guild id, income role id) -> set of member ids
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(member) -> tuple:
+        guild = getattr(member, 'guild', None)
+        return (guild.id if guild else None, member.id)
+
+    def resolve(self, member) -> MemberTier:
+        role_ids = frozenset(self.roles.role_ids(member))
+        work_role_id, work_config, _ = self.roles.work_tier(member, role_ids)
+        income_role_id, income_config, income_knuts = self.roles.income_tier(member, role_ids)
+        return MemberTier(work_role_id, work_config, income_role_id, income_config, income_knuts,
+                          self.roles.house(member, role_ids), self.roles.is_banker(member, role_ids),
+                          self.roles.is_shop_manager(member, role_ids), role_ids)
+
+    def get(self, member) -> MemberTier:
+        tier = self._tiers.get(self._key(member))
+        if tier is not None:
+            self.hits += 1
+            return tier
+        self.misses += 1
+        return self.update(member)
+
+    def update(self, member) -> MemberTier:
+        """Re-resolve a member (their roles changed or they just joined)"""
+        key = self._key(member)
+        self._unindex(key)
+        tier = self.resolve(member)
+        self._tiers[key] = tier
+        if tier.income_role_id is not None:
+            self._by_income_role.setdefault((key[0], tier.income_role_id), set()).add(key[1])
+        return tier
+
+    def remove(self, member):
+        key = self._key(member)
+        self._unindex(key)
+        self._tiers.pop(key, None)
+
+    def _unindex(self, key: tuple):
+        old = self._tiers.get(key)
+        if old is None or old.income_role_id is None:
+            return
+        index_key = (key[0], old.income_role_id)
+        members = self._by_income_role.get(index_key)
+        if members is not None:
+            members.discard(key[1])
+            if not members:
+                del self._by_income_role[index_key]
+
+    def load_guild(self, guild) -> int:
+        """Resolve every cached member of a guild up front; returns how many were loaded"""
+        for member in guild.members:
+            self.update(member)
+        return len(guild.members)
+
+    def members_with_income_role(self, guild_id: int, role_id: int) -> frozenset:
+        """Ids of members whose best income role is role_id"""
+        return frozenset(self._by_income_role.get((guild_id, role_id), ()))
+
+class RankIndex:
+    """In-memory order statistics for the leaderboard metrics
+    
+    Each metric keeps its users (with a value above zero) in a list sorted by
+    (-value, user_id), so a rank is one binary search and the neighbours are the
+    adjacent entries. The bank updates single entries after each write commits.
+    """
+    METRICS = ('wealth', 'transactions', 'income')
+
     def __init__(self):
-        # Set database connection parameters first
-        self.max_retries = 5
-        self.retry_delay = 0.1
+        self._lock = threading.Lock()
+        self._values = {metric: {} for metric in self.METRICS}  # metric -> user_id -> value
+        self._sorted = {metric: [] for metric in self.METRICS}  # metric -> [(-value, user_id)]
+        self.names = {}
+
+    def load(self, rows):
+        """Rebuild from (user_id, username, balance, transaction count, lifetime income) rows"""
+        with self._lock:
+            self.names = {}
+            self._values = {metric: {} for metric in self.METRICS}
+            for user_id, username, *values in rows:
+                self.names[user_id] = username
+                for metric, value in zip(self.METRICS, values):
+                    if value and value > 0:
+                        self._values[metric][user_id] = value
+            self._sorted = {metric: sorted((-value, user_id) for user_id, value in self._values[metric].items())
+                            for metric in self.METRICS}
+
+    def update(self, metric: str, user_id: str, value: int, username: str = None):
+        with self._lock:
+            if username:
+                self.names[user_id] = username
+            values, ordered = self._values[metric], self._sorted[metric]
+            old = values.pop(user_id, None)
+            if old is not None:
+                del ordered[bisect.bisect_left(ordered, (-old, user_id))]
+            if value and value > 0:
+                values[user_id] = value
+                bisect.insort(ordered, (-value, user_id))
+
+    def rename(self, user_id: str, username: str):
+        self.names[user_id] = username
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def rank(self, metric: str, user_id: str, neighbours: int = 2) -> dict:
+        """Position of a user on a metric, or None if they have no value on it
+        
+        Returns {'rank', 'total', 'value', 'entries'} where entries are (rank, user_id,
+        username, value) for the user and up to `neighbours` users on either side.
+        """
+        with self._lock:
+            value = self._values[metric].get(user_id)
+            if value is None:
+                return None
+            ordered = self._sorted[metric]
+            position = bisect.bisect_left(ordered, (-value, user_id))
+            start = max(position - neighbours, 0)
+            entries = [(start + i + 1, other, self.names.get(other), -negated)
+                       for i, (negated, other) in enumerate(ordered[start:position + neighbours + 1])]
+            return {'rank': position + 1, 'total': len(ordered), 'value': value, 'entries': entries}
+
+class LeaderboardCache:
+    """Rendered leaderboards by (category, window), shared between requests
+    
+    Entries live for `ttl` seconds and are dropped early when a committed write moves
+    a user who is on the board, or one whose new value reaches the lowest value shown.
+    Concurrent misses for the same board share a single computation.
+    """
+    def __init__(self, ttl: float = 30.0, size: int = 10):
+        self.ttl = ttl
+        self.size = size
+        self._lock = threading.Lock()  # invalidations arrive from the writer thread
+        self._entries = {}    # key -> (expires at, embed, user ids on the board, lowest value shown)
+        self._inflight = {}   # key -> task computing it
+        self._stale = set()   # in-flight keys invalidated before they finished
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: tuple, compute):
+        """Cached embed for key, or the result of `await compute()` -> (rows, embed)
+        
+        rows are the board's (user_id, username, value) rows.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            task = self._inflight.get(key)
+            if task is None:
+                self.misses += 1
+                task = asyncio.get_running_loop().create_task(self._compute(key, compute))
+                self._inflight[key] = task
+            else:
+                self.hits += 1
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: tuple, compute):
+        try:
+            rows, embed = await compute()
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                stale = key in self._stale
+                self._stale.discard(key)
+        if not stale:
+            threshold = rows[-1][2] if len(rows) >= self.size else 1
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl, embed,
+                                      frozenset(row[0] for row in rows), threshold)
+        return embed
+
+    def invalidate(self, metric: str, user_id: str, value: int):
+        """A committed write set user_id's all-time value for metric (category)
+        
+        Windowed boards are checked against the all-time value too; it's an upper
+        bound on any window's total.
+        """
+        with self._lock:
+            for key, (_, _, user_ids, threshold) in list(self._entries.items()):
+                if key[0] == metric and (user_id in user_ids or value >= threshold):
+                    del self._entries[key]
+                    self.invalidations += 1
+            # A board being computed right now may or may not include this write
+            self._stale.update(key for key in self._inflight if key[0] == metric)
+
+class TokenBucket:
+    """Async token bucket: up to `rate` sends per `per` seconds, with bursts of `rate`"""
+    def __init__(self, rate: float, per: float):
+        self.capacity = rate
+        self.refill_rate = rate / per  # tokens per second
+        self._tokens = float(rate)
+        self._last_refill = time.monotonic()
+
+    async def take(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.refill_rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.refill_rate)
+
+class LogDispatcher:
+    """Background sender for log channel embeds
+    
+    Commands enqueue embeds and return immediately. A single task drains the queue,
+    packing up to 10 embeds (6000 characters) into each message and spending tokens
+    from a bucket sized to the channel's send limit; anything that arrives while it
+    waits for a token is coalesced into the next message.
+    """
+    MAX_EMBEDS_PER_MESSAGE = 10
+    MAX_CHARS_PER_MESSAGE = 6000
+
+    def __init__(self, channel_id: int, rate: float = 5, per: float = 5.0, linger: float = 0.5):
+        self.channel_id = channel_id
+        self.linger = linger
         
-        # Then load config
-        with open('config.json') as f:
+        self._bucket = TokenBucket(rate, per)
+        self._queue = deque()
+        self._wakeup = None
+        self._task = None
+        self.bot = None
+        
+        self.messages_sent = 0
+        self.embeds_sent = 0
+        self.embeds_dropped = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, bot, embed, on_done=None):
+        """Queue an embed for the log channel; never waits on Discord
+        
+        on_done, if given, is called with True once the embed was posted or False if
+        the send failed.
+        """
+        self.bot = bot
+        self._queue.append((embed, on_done))
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    def _next_message(self) -> list:
+        entries, chars = [], 0
+        while self._queue and len(entries) < self.MAX_EMBEDS_PER_MESSAGE:
+            size = len(self._queue[0][0])
+            if entries and chars + size > self.MAX_CHARS_PER_MESSAGE:
+                break
+            entries.append(self._queue.popleft())
+            chars += size
+        return entries
+
+    @staticmethod
+    def _finish(entries: list, delivered: bool):
+        for _, on_done in entries:
+            if on_done is not None:
+                on_done(delivered)
+
+    async def _run(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            # Let a burst build up so it goes out as one message
+            await asyncio.sleep(self.linger)
+            await self._bucket.take()
+            
+            entries = self._next_message()
+            if not entries:
+                continue
+            channel = self.bot.get_channel(self.channel_id)
+            if channel is None:
+                print(f"Could not find log channel with ID {self.channel_id}")
+                self.embeds_dropped += len(entries)
+                self._finish(entries, False)
+                continue
+            try:
+                await channel.send(embeds=[embed for embed, _ in entries])
+            except Exception as e:
+                print(f"Error sending log message: {e}")
+                self.embeds_dropped += len(entries)
+                self._finish(entries, False)
+            else:
+                self.messages_sent += 1
+                self.embeds_sent += len(entries)
+                self._finish(entries, True)
+
+class UserLockManager:
+    """Per-user asyncio locks that serialize one account's money-moving operations
+    
+    Locks are kept in a WeakValueDictionary, so a user's lock goes away as soon as
+    nobody holds or waits on it.
+    """
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+        self.queued = 0    # operations that had to wait for the same user's previous one
+        self.rejected = 0  # operations turned away because one was already running
+
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, user_id: str, wait: bool = True):
+        """Hold a user's lock for the duration of the block.
+        
+        With wait=False a busy lock isn't waited for: the block gets False and runs
+        without the lock so the caller can reject the request.
+        """
+        lock = self._lock(user_id)
+        if lock.locked():
+            if not wait:
+                self.rejected += 1
+                yield False
+                return
+            self.queued += 1
+        async with lock:
+            yield True
+
+class IdempotencyCache:
+    """Recent results of money-moving commands by idempotency key (LRU)
+    
+    The transactions table is the durable record of which keys were applied; this only
+    answers a duplicate that arrives while the result is still in memory, before it
+    reaches the writer.
+    """
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._results = OrderedDict()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def get(self, key: str):
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            self.hits += 1
+        return result
+
+    def put(self, key: str, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_size:
+            self._results.popitem(last=False)
+
+class CooldownEngine:
+    """Cooldown expiries as integer epoch seconds, checked in memory
+    
+    A user's expiries are read from the cooldowns table the first time they are needed
+    and kept in a dict. A heap of (expiry, user, kind) drops them again once they have
+    passed, so checks never touch the database after the first one.
+    """
+    COLUMNS = {'work': 'work_until', 'income': 'income_until'}
+    REMINDER_COLUMNS = {'work': 'remind_work', 'income': 'remind_income'}
+
+    def __init__(self, durations: dict):
+        self.durations = durations  # kind -> cooldown length in seconds
+        self._until = {}            # user_id -> {kind: expiry}, {} once loaded with nothing active
+        self._heap = []             # (expiry, user_id, kind), may hold superseded entries
+        self.loads = 0
+
+    def __len__(self) -> int:
+        return len(self._until)
+
+    def is_loaded(self, user_id: str) -> bool:
+        return user_id in self._until
+
+    def load(self, user_id: str, expiries: dict):
+        """Remember expiries read from the database (later ones already in memory win)"""
+        self.loads += 1
+        current = self._until.setdefault(user_id, {})
+        for kind, until in expiries.items():
+            if until and until > current.get(kind, 0):
+                self.set(user_id, kind, until)
+
+    def set(self, user_id: str, kind: str, until: int):
+        self._until.setdefault(user_id, {})[kind] = until
+        heapq.heappush(self._heap, (until, user_id, kind))
+
+    def expire(self, now: int):
+        """Forget every expiry that has passed"""
+        while self._heap and self._heap[0][0] <= now:
+            until, user_id, kind = heapq.heappop(self._heap)
+            expiries = self._until.get(user_id)
+            if expiries and expiries.get(kind) == until:
+                del expiries[kind]
+
+    def remaining(self, user_id: str, kind: str, now: int) -> int:
+        """Seconds until the user's cooldown runs out (0 if ready); user must be loaded"""
+        self.expire(now)
+        return max(self._until[user_id].get(kind, 0) - now, 0)
+
+class ReminderScheduler:
+    """DMs opted-in members when their work or income cooldown expires
+    
+    A single task sleeps until the earliest entry of a heap of (expiry, user_id, kind).
+    It wakes at most once per `coalesce` seconds and handles everything that is due by
+    then in one pass; the DMs share a token bucket so a burst of expiries can't flood
+    the REST API.
+    """
+    def __init__(self, rate: float = 10, per: float = 1.0, coalesce: float = 5.0):
+        self.coalesce = coalesce
+        self.opted_in = set()  # (user_id, kind)
+        self._bucket = TokenBucket(rate, per)
+        self._heap = []        # (expiry, user_id, kind), may hold superseded entries
+        self._scheduled = {}   # (user_id, kind) -> expiry of the live heap entry
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._scheduled)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def schedule(self, user_id: str, kind: str, until: int):
+        """Remind the user at `until` if they opted in (replaces an earlier schedule)"""
+        key = (user_id, kind)
+        if key not in self.opted_in or until <= time.time():
+            return
+        self._scheduled[key] = until
+        heapq.heappush(self._heap, (until, user_id, kind))
+        if self._loop is not None and self._heap[0][0] == until:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def opt_in(self, user_id: str, kind: str, until: int = None):
+        self.opted_in.add((user_id, kind))
+        if until:
+            self.schedule(user_id, kind, until)
+
+    def opt_out(self, user_id: str, kind: str):
+        self.opted_in.discard((user_id, kind))
+        self._scheduled.pop((user_id, kind), None)
+
+    def start(self, rows, send):
+        """Load (user_id, kind, expiry) opt-in rows and start the task; send(user_id, kind) DMs one member"""
+        for user_id, kind, until in rows:
+            self.opt_in(user_id, kind, until)
+        if not self.running:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._run(send))
+
+    def _pop_due(self, now: float) -> list:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            until, user_id, kind = heapq.heappop(self._heap)
+            if self._scheduled.get((user_id, kind)) == until:
+                del self._scheduled[(user_id, kind)]
+                due.append((user_id, kind))
+        return due
+
+    async def _run(self, send):
+        while True:
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            for user_id, kind in self._pop_due(time.time()):
+                if (user_id, kind) not in self.opted_in:
+                    continue
+                await self._bucket.take()
+                try:
+                    await send(user_id, kind)
+                    self.sent += 1
+                except Exception as e:
+                    print(f"Error sending {kind} reminder to {user_id}: {e}")
+                    self.failed += 1
+            # Let expiries that land close together go out in the same pass
+            await asyncio.sleep(self.coalesce)
+
+class DeferredReply:
+    """The reply to one slash command: sent directly, or as a followup once deferred"""
+    def __init__(self, interaction: discord.Interaction, ephemeral: bool):
+        self.interaction = interaction
+        self.ephemeral = ephemeral
+        self.deferred = False
+        # A defer and the reply must never race each other for the initial response
+        self._lock = asyncio.Lock()
+
+    async def defer(self) -> bool:
+        """Acknowledge the interaction ("thinking...") unless it was already answered"""
+        async with self._lock:
+            if self.interaction.response.is_done():
+                return False
+            await self.interaction.response.defer(ephemeral=self.ephemeral, thinking=True)
+            self.deferred = True
+            return True
+
+    async def send(self, *args, **kwargs):
+        async with self._lock:
+            if self.interaction.response.is_done():
+                kwargs.setdefault('ephemeral', self.ephemeral)
+                return await self.interaction.followup.send(*args, **kwargs)
+            return await self.interaction.response.send_message(*args, **kwargs)
+
+class ResponseBudgets:
+    """Per-command latency budgets for answering inside Discord's 3 second window
+    
+    Each command's run time is tracked as an EWMA. A command predicted to run past its
+    budget is deferred up front; otherwise a watchdog defers it once the budget is
+    spent, and the reply goes out as a followup.
+    """
+    def __init__(self, budgets: dict = None, alpha: float = 0.2):
+        self.budgets = {'default': 2.0, **(budgets or {})}
+        self.alpha = alpha
+        self.latency = {}             # command -> EWMA of its run time in seconds
+        self.calls = {}
+        self.deferred_predicted = {}  # deferred up front because the EWMA was over budget
+        self.deferred_late = {}       # deferred by the watchdog when the budget ran out
+
+    def budget(self, command: str) -> float:
+        return self.budgets.get(command, self.budgets['default'])
+
+    def _count(self, counter: dict, command: str):
+        counter[command] = counter.get(command, 0) + 1
+
+    async def _watchdog(self, reply: DeferredReply, command: str, budget: float):
+        await asyncio.sleep(budget)
+        try:
+            if await reply.defer():
+                self._count(self.deferred_late, command)
+        except discord.HTTPException as e:
+            print(f"Error deferring {command}: {e}")
+
+    @asynccontextmanager
+    async def track(self, interaction: discord.Interaction, command: str, ephemeral: bool = False):
+        """Time the block and hand it a DeferredReply to answer the interaction with"""
+        reply = DeferredReply(interaction, ephemeral)
+        budget = self.budget(command)
+        self._count(self.calls, command)
+        watchdog = None
+        if self.latency.get(command, 0.0) > budget:
+            try:
+                if await reply.defer():
+                    self._count(self.deferred_predicted, command)
+            except discord.HTTPException as e:
+                # Same as the watchdog: the block still runs and answers as best it can
+                print(f"Error deferring {command}: {e}")
+        else:
+            watchdog = asyncio.create_task(self._watchdog(reply, command, budget))
+        
+        start = time.perf_counter()
+        try:
+            yield reply
+        finally:
+            if watchdog:
+                watchdog.cancel()
+            elapsed = time.perf_counter() - start
+            previous = self.latency.get(command)
+            self.latency[command] = elapsed if previous is None else previous + self.alpha * (elapsed - previous)
+
+# Store user balances and cooldowns
+class BankSystem:
+    def __init__(self, config_path: str = 'config.json', database: str = 'bank.db'):
+        # Load config first
+        with open(config_path) as f:
             self.config = json.load(f)
         
+        # Backoff and budgets for database calls that hit lock contention
+        self.retry = RetryPolicy(budgets=self.config.get('db_retry_budgets'))
+        
         self.currency_emoji = self.config['currency_emoji']
         self.banker_roles = self.config['banker_roles']
         self.default_work = self.config['default_work']
@@ -47,9 +1179,53 @@ class BankSystem:
         self.KNUTS_PER_SICKLE = 29
         self.KNUTS_PER_GALLEON = 493  # 17 * 29
         
+        # Role rewards and permissions, resolved per member by set intersection
+        self.roles = RoleTables(self.config, {'galleon': self.KNUTS_PER_GALLEON,
+                                              'sickle': self.KNUTS_PER_SICKLE,
+                                              'knut': 1})
+        # Serializes each user's money-moving commands inside this process
+        self.user_locks = UserLockManager()
+        # Results of recently applied interactions, so retries and double clicks are free
+        self.idempotency = IdempotencyCache(self.config.get('idempotency_cache_size', 1024))
+        # Slow commands defer before Discord's acknowledgment window closes
+        self.responses = ResponseBudgets(self.config.get('response_budgets'))
+        
+        # Per-member resolved tiers, kept current by the member gateway events
+        self.members = MemberTierCache(self.roles)
+        
+        # Cooldowns enforced by aperform_work / aperform_income_collection
+        self.cooldowns = CooldownEngine({
+            'work': self.config.get('work_cooldown_seconds', 4 * 60 * 60),
+            'income': self.config.get('income_cooldown_seconds', 7 * 24 * 60 * 60),
+        })
+        # Opt-in DMs when a cooldown runs out (started in on_ready)
+        self.reminders = ReminderScheduler(coalesce=self.config.get('reminder_batch_delay', 5.0))
+        
+        # Shared connection pool (PRAGMAs run once per connection)
+        self.pool = ConnectionPool(database, max_size=self.config.get('db_pool_size', 5),
+                                   busy_timeout=self.config.get('db_busy_timeout', 0.1))
+        # Worker threads that run blocking DB calls for the async facade
+        self.db_executor = ThreadPoolExecutor(max_workers=self.pool.max_size,
+                                              thread_name_prefix='bank-db')
+        
         # Initialize database
         self.init_database()
         
+        # All writes go through one writer thread that group-commits them
+        self.writer = GroupCommitWriter(self.pool.create_connection,
+                                        max_batch_size=self.config.get('db_write_batch_size', 64),
+                                        max_batch_delay=self.config.get('db_write_batch_delay', 0.002),
+                                        retry=self.retry)
+        
+        # Active shop items, kept in memory and updated by the catalog writers
+        self.catalog = ShopCatalogCache(self.get_catalog_rows, self.format_currency_short)
+        
+        # Leaderboard positions, loaded once and moved by each committed balance/ledger write
+        self.ranks = RankIndex()
+        self.ranks.load(self.get_rank_rows())
+        # Rendered /leaderboard embeds, dropped early by the same writes
+        self.leaderboards = LeaderboardCache(ttl=self.config.get('leaderboard_cache_ttl', 30.0))
+        
         # Add work quotes
         self.work_quotes = [
             "قمت بتوصيل عدد المتنبئ للعالم السحري نيابه عن بومه الانسه رولا فكافئتك ب",
@@ -74,282 +1250,507 @@ class BankSystem:
         ]
         
         self.log_channel_id = self.config['log_channel_id']
+        # Log channel posts are batched and sent in the background
+        self.log_dispatcher = LogDispatcher(self.log_channel_id,
+                                            linger=self.config.get('log_batch_delay', 0.5))
+        
+        # Audit outbox drainer state (see start_audit_drainer)
+        self.audit_poll_interval = 5.0
+        self.audit_retry_max_delay = 600.0
+        # Delivered rows are kept this long for inspection, then deleted
+        self.audit_retention_days = self.config.get('audit_retention_days', 7)
+        self._audit_task = None
+        self._audit_wakeup = None
+        self._audit_cursor = 0          # highest outbox id handed to the dispatcher
+        self._audit_in_flight = set()   # ids queued but not yet marked sent
+        self._audit_delivered = []      # ids posted to Discord, waiting to be marked sent
+        self._audit_retry = {}          # id -> (failed attempts, monotonic time of next attempt)
 
     def init_database(self):
-        with self.get_db_connection() as conn:
-            c = conn.cursor()
-            try:
-                # Enable foreign key support
-                c.execute('PRAGMA foreign_keys = ON')
-                c.execute('BEGIN TRANSACTION')
-                
-                # Create cooldowns table first
-                c.execute('''CREATE TABLE IF NOT EXISTS cooldowns
-                            (user_id TEXT PRIMARY KEY,
-                             work_cooldown TEXT,
-                             income_cooldown TEXT)''')
-                
-                # Create transactions table
-                c.execute('''CREATE TABLE IF NOT EXISTS transactions
-                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             user_id TEXT,
-                             amount INTEGER,
-                             type TEXT,
-                             timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                             modifier_id TEXT,
-                             details TEXT)''')
-                
-                # Create version table
-                c.execute('''CREATE TABLE IF NOT EXISTS db_version
-                            (version INTEGER PRIMARY KEY)''')
-                
-                # Get current version
-                c.execute('SELECT version FROM db_version')
-                result = c.fetchone()
-                current_version = result[0] if result else 0
-                
-                # Create tables in proper order (dependencies first)
-                c.execute('''CREATE TABLE IF NOT EXISTS users
-                            (user_id TEXT PRIMARY KEY,
-                             username TEXT,
-                             galleons INTEGER DEFAULT 0,
-                             sickles INTEGER DEFAULT 0,
-                             knuts INTEGER DEFAULT 0,
-                             favorite_spells TEXT DEFAULT '',
-                             pets TEXT DEFAULT '',
-                             bio TEXT DEFAULT '')''')
-                
-                c.execute('''CREATE TABLE IF NOT EXISTS shop_items
-                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             name TEXT NOT NULL,
-                             price INTEGER NOT NULL,
-                             category TEXT NOT NULL,
-                             description TEXT,
-                             properties TEXT,
-                             required_role TEXT,
-                             added_by TEXT NOT NULL,
-                             added_timestamp TEXT DEFAULT CURRENT_TIMESTAMP)''')
-                
-                c.execute('''CREATE TABLE IF NOT EXISTS removed_shop_items
-                            (id INTEGER PRIMARY KEY,
-                             name TEXT NOT NULL,
-                             price INTEGER NOT NULL,
-                             category TEXT NOT NULL,
-                             description TEXT,
-                             properties TEXT,
-                             added_by TEXT NOT NULL,
-                             removed_timestamp TEXT DEFAULT CURRENT_TIMESTAMP)''')
-                
-                c.execute('''CREATE TABLE IF NOT EXISTS inventory
-                            (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                             user_id TEXT NOT NULL,
-                             item_id INTEGER NOT NULL,
-                             properties TEXT,
-                             obtained_timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
-                             is_removed_item BOOLEAN DEFAULT 0,
-                             category TEXT,
-                             FOREIGN KEY(user_id) REFERENCES users(user_id))''')
-
-                # Add indexes for performance
-                c.execute('CREATE INDEX IF NOT EXISTS idx_inventory_user_id ON inventory(user_id)')
-                c.execute('CREATE INDEX IF NOT EXISTS idx_shop_items_category ON shop_items(category)')
-                
-                # Add default items if needed
-                if current_version < 5:
-                    try:
-                        # Add default wand if none exists
-                        c.execute('SELECT 1 FROM shop_items WHERE category = "Wands" LIMIT 1')
-                        if not c.fetchone():
-                            c.execute('''INSERT INTO shop_items 
-                                        (name, price, category, description, properties, added_by)
-                                        VALUES (?, ?, ?, ?, ?, ?)''',
-                                     ("Training Wand", 
-                                      1 * self.KNUTS_PER_GALLEON,  # 1 Galleons
-                                      "Wands",
-                                      "A basic training wand for new students",
-                                      json.dumps({
-                                          "wood": "Cherry",
-                                          "core": "Unicorn Hair",
-                                          "length": 8.75,
-                                          "flexibility": "Slightly Springy",
-                                          "power": "0"
-                                      }),
-                                      "SYSTEM"))
-                            print("Added default wand")
-
-                        # Add default broom if none exists
-                        c.execute('SELECT 1 FROM shop_items WHERE category = "Brooms" LIMIT 1')
-                        if not c.fetchone():
-                            c.execute('''INSERT INTO shop_items 
-                                        (name, price, category, description, properties, added_by)
-                                        VALUES (?, ?, ?, ?, ?, ?)''',
-                                     ("Training Broom", 
-                                      1 * self.KNUTS_PER_GALLEON,  # 1 Galloen
-                                      "Brooms",
-                                      "A reliable training broom for beginners",
-                                      json.dumps({
-                                          "wood": "Birch",
-                                          "bristle": "Twiggy Birch",
-                                          "length": 48,
-                                          "speed": "0"
-                                      }),
-                                      "SYSTEM"))
-                            print("Added default broom")
-
-                        # Add default accessory if none exists
-                        c.execute('SELECT 1 FROM shop_items WHERE category = "Accessories" LIMIT 1')
-                        if not c.fetchone():
-                            c.execute('''INSERT INTO shop_items 
-                                        (name, price, category, description, properties, added_by)
-                                        VALUES (?, ?, ?, ?, ?, ?)''',
-                                     ("Basic Necklace", 
-                                      1 * self.KNUTS_PER_GALLEON, # 1 Galloen
-                                      "Accessories",
-                                      "A simple magical necklace",
-                                      json.dumps({
-                                          "material": "Silver",
-                                          "type": "Necklace",
-                                          "enchantment": "+1 Ac"
-                                      }),
-                                      "SYSTEM"))
-                            print("Added default accessory")
-                    except Exception as e:
-                        print(f"Error adding default items: {e}")
-                        raise
-
-                # Update version if needed
-                if current_version < 5:
-                    if current_version == 0:
-                        c.execute('INSERT INTO db_version (version) VALUES (5)')
+        """Bring the schema up to date by running any pending migrations"""
+        # Use a one-off connection so the foreign_keys PRAGMA doesn't leak into the pool
+        with self.get_db_connection(pooled=False) as conn:
+            conn.isolation_level = None  # Each migration step manages its own transaction
+            conn.execute('PRAGMA foreign_keys = ON')
+            # Startup isn't covered by the retry policy, so let SQLite wait out other writers
+            conn.execute('PRAGMA busy_timeout=30000')
+            
+            current_version = self._get_db_version(conn)
+            pending = [m for m in self.migrations() if m[0] > current_version]
+            if not pending:
+                print(f"Database schema is up to date (version {current_version})")
+                return
+            
+            for version, description, migrate, chunked in pending:
+                try:
+                    if chunked:
+                        # Chunked steps commit as they go so they never hold the write
+                        # lock for long; they must be safe to re-run if interrupted
+                        migrate(conn)
+                        conn.execute('BEGIN IMMEDIATE')
                     else:
-                        c.execute('UPDATE db_version SET version = 5')
-                    print("Updated database to version 5")
-                
-                conn.commit()
-                print("Database initialization complete!")
-                
-            except Exception as e:
-                conn.rollback()
-                print(f"Error initializing database: {e}")
-                raise
+                        conn.execute('BEGIN IMMEDIATE')
+                        migrate(conn.cursor())
+                    self._set_db_version(conn, version)
+                    conn.execute('COMMIT')
+                except Exception as e:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    print(f"Error applying migration {version} ({description}): {e}")
+                    raise
+                print(f"Updated database to version {version}: {description}")
+            
+            print("Database initialization complete!")
 
-    def update_username(self, user_id: str, username: str):
-        with self.get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute('''INSERT INTO users (user_id, username, galleons, sickles, knuts) 
-                        VALUES (?, ?, 0, 0, 0)
-                        ON CONFLICT(user_id) 
-                        DO UPDATE SET username = ?''',
-                     (user_id, username, username))
-            conn.commit()
+    def migrations(self) -> list:
+        """Ordered schema migrations as (version, description, function, chunked).
+        
+        Regular steps get a cursor inside their own transaction. Chunked steps get the
+        connection and are expected to commit in batches (see _backfill_in_chunks).
+        """
+        return [
+            (5, "base schema and default shop items", self._migrate_base_schema, False),
+            (6, "single integer balance column", self._migrate_balance_knuts, True),
+            (7, "indexes for hot queries", self._migrate_hot_query_indexes, False),
+            (8, "unified item catalog", self._migrate_unified_catalog, False),
+            (9, "stacked inventory quantities", self._migrate_inventory_quantity, False),
+            (10, "audit log outbox", self._migrate_audit_outbox, False),
+            (11, "idempotency keys on the ledger", self._migrate_idempotency_keys, False),
+            (12, "epoch cooldown expiries", self._migrate_cooldown_expiries, True),
+            (13, "cooldown reminder opt-ins", self._migrate_cooldown_reminders, False),
+            (14, "leaderboard aggregates", self._migrate_user_stats, True),
+            (15, "daily ledger rollups", self._migrate_ledger_rollups, True),
+            (16, "audit outbox pruning", self._migrate_audit_pruning, False),
+        ]
+
+    def _get_db_version(self, conn) -> int:
+        try:
+            result = conn.execute('SELECT MAX(version) FROM db_version').fetchone()
+        except sqlite3.OperationalError:
+            return 0  # Fresh database
+        return result[0] or 0
+
+    def _set_db_version(self, conn, version: int):
+        conn.execute('DELETE FROM db_version')
+        conn.execute('INSERT INTO db_version (version) VALUES (?)', (version,))
+
+    def _column_exists(self, conn, table: str, column: str) -> bool:
+        return any(row[1] == column for row in conn.execute(f'PRAGMA table_info({table})'))
+
+    def _in_rowid_chunks(self, conn, table: str, sql: str, params: tuple = (),
+                         chunk_size: int = 5000):
+        """Run sql over rowid ranges of table, one short transaction per chunk.
+        
+        sql must end with a `rowid > ? AND rowid <= ?` filter; params come before it.
+        """
+        max_rowid = conn.execute(f'SELECT MAX(rowid) FROM {table}').fetchone()[0] or 0
+        for start in range(0, max_rowid, chunk_size):
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(sql, (*params, start, start + chunk_size))
+            conn.execute('COMMIT')
+
+    def _backfill_in_chunks(self, conn, table: str, set_clause: str, params: tuple = (),
+                            chunk_size: int = 5000):
+        """Run UPDATE <table> SET ... over rowid ranges, one short transaction per chunk"""
+        self._in_rowid_chunks(conn, table, f'UPDATE {table} SET {set_clause} WHERE rowid > ? AND rowid <= ?',
+                              params, chunk_size)
+
+    def _migrate_base_schema(self, c):
+        # Create cooldowns table first
+        c.execute('''CREATE TABLE IF NOT EXISTS cooldowns
+                    (user_id TEXT PRIMARY KEY,
+                     work_cooldown TEXT,
+                     income_cooldown TEXT)''')
+        
+        # Create transactions table
+        c.execute('''CREATE TABLE IF NOT EXISTS transactions
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     user_id TEXT,
+                     amount INTEGER,
+                     type TEXT,
+                     timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                     modifier_id TEXT,
+                     details TEXT)''')
+        
+        # Create version table
+        c.execute('''CREATE TABLE IF NOT EXISTS db_version
+                    (version INTEGER PRIMARY KEY)''')
+        
+        # Create tables in proper order (dependencies first)
+        c.execute('''CREATE TABLE IF NOT EXISTS users
+                    (user_id TEXT PRIMARY KEY,
+                     username TEXT,
+                     galleons INTEGER DEFAULT 0,
+                     sickles INTEGER DEFAULT 0,
+                     knuts INTEGER DEFAULT 0,
+                     favorite_spells TEXT DEFAULT '',
+                     pets TEXT DEFAULT '',
+                     bio TEXT DEFAULT '')''')
+        
+        c.execute('''CREATE TABLE IF NOT EXISTS shop_items
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     name TEXT NOT NULL,
+                     price INTEGER NOT NULL,
+                     category TEXT NOT NULL,
+                     description TEXT,
+                     properties TEXT,
+                     required_role TEXT,
+                     added_by TEXT NOT NULL,
+                     added_timestamp TEXT DEFAULT CURRENT_TIMESTAMP)''')
+        
+        c.execute('''CREATE TABLE IF NOT EXISTS removed_shop_items
+                    (id INTEGER PRIMARY KEY,
+                     name TEXT NOT NULL,
+                     price INTEGER NOT NULL,
+                     category TEXT NOT NULL,
+                     description TEXT,
+                     properties TEXT,
+                     added_by TEXT NOT NULL,
+                     removed_timestamp TEXT DEFAULT CURRENT_TIMESTAMP)''')
+        
+        c.execute('''CREATE TABLE IF NOT EXISTS inventory
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     user_id TEXT NOT NULL,
+                     item_id INTEGER NOT NULL,
+                     properties TEXT,
+                     obtained_timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                     is_removed_item BOOLEAN DEFAULT 0,
+                     category TEXT,
+                     FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+
+        # Add indexes for performance
+        c.execute('CREATE INDEX IF NOT EXISTS idx_inventory_user_id ON inventory(user_id)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_shop_items_category ON shop_items(category)')
+        
+        # Add default wand if none exists
+        c.execute('SELECT 1 FROM shop_items WHERE category = "Wands" LIMIT 1')
+        if not c.fetchone():
+            c.execute('''INSERT INTO shop_items 
+                        (name, price, category, description, properties, added_by)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     ("Training Wand", 
+                      1 * self.KNUTS_PER_GALLEON,  # 1 Galleons
+                      "Wands",
+                      "A basic training wand for new students",
+                      json.dumps({
+                          "wood": "Cherry",
+                          "core": "Unicorn Hair",
+                          "length": 8.75,
+                          "flexibility": "Slightly Springy",
+                          "power": "0"
+                      }),
+                      "SYSTEM"))
+            print("Added default wand")
+
+        # Add default broom if none exists
+        c.execute('SELECT 1 FROM shop_items WHERE category = "Brooms" LIMIT 1')
+        if not c.fetchone():
+            c.execute('''INSERT INTO shop_items 
+                        (name, price, category, description, properties, added_by)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     ("Training Broom", 
+                      1 * self.KNUTS_PER_GALLEON,  # 1 Galloen
+                      "Brooms",
+                      "A reliable training broom for beginners",
+                      json.dumps({
+                          "wood": "Birch",
+                          "bristle": "Twiggy Birch",
+                          "length": 48,
+                          "speed": "0"
+                      }),
+                      "SYSTEM"))
+            print("Added default broom")
+
+        # Add default accessory if none exists
+        c.execute('SELECT 1 FROM shop_items WHERE category = "Accessories" LIMIT 1')
+        if not c.fetchone():
+            c.execute('''INSERT INTO shop_items 
+                        (name, price, category, description, properties, added_by)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     ("Basic Necklace", 
+                      1 * self.KNUTS_PER_GALLEON, # 1 Galloen
+                      "Accessories",
+                      "A simple magical necklace",
+                      json.dumps({
+                          "material": "Silver",
+                          "type": "Necklace",
+                          "enchantment": "+1 Ac"
+                      }),
+                      "SYSTEM"))
+            print("Added default accessory")
+
+    def _migrate_balance_knuts(self, conn):
+        # Balances live in a single integer knut column; the galleons/sickles/knuts
+        # columns are legacy and no longer maintained
+        if not self._column_exists(conn, 'users', 'balance_knuts'):
+            conn.execute('ALTER TABLE users ADD COLUMN balance_knuts INTEGER NOT NULL DEFAULT 0')
+        self._backfill_in_chunks(conn, 'users', 'balance_knuts = galleons * ? + sickles * ? + knuts',
+                                 (self.KNUTS_PER_GALLEON, self.KNUTS_PER_SICKLE))
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_users_balance_knuts ON users(balance_knuts DESC)')
+
+    def _migrate_hot_query_indexes(self, c):
+        # remove_item counts and flags every owner of an item
+        c.execute('CREATE INDEX IF NOT EXISTS idx_inventory_item_id ON inventory(item_id)')
+        # Per-user ledger lookups and the transactions leaderboard
+        c.execute('CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions(user_id)')
+        # Covering index for the income leaderboard (type filter, per-user sums)
+        c.execute('CREATE INDEX IF NOT EXISTS idx_transactions_type_user ON transactions(type, user_id, amount)')
+
+    def _migrate_unified_catalog(self, c):
+        # Removed items stay in shop_items with a removed_at timestamp instead of
+        # being copied to removed_shop_items; inventory.is_removed_item is legacy
+        if not self._column_exists(c.connection, 'shop_items', 'removed_at'):
+            c.execute('ALTER TABLE shop_items ADD COLUMN removed_at TEXT')
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'removed_shop_items'")
+        if c.fetchone():
+            c.execute('''INSERT OR IGNORE INTO shop_items 
+                        (id, name, price, category, description, properties, added_by, removed_at)
+                        SELECT id, name, price, category, description, properties, added_by,
+                               COALESCE(removed_timestamp, datetime('now'))
+                        FROM removed_shop_items''')
+            c.execute('DROP TABLE removed_shop_items')
+
+        # Inventory rows carry their item's category so lookups never touch the catalog
+        c.execute('''UPDATE inventory 
+                    SET category = (SELECT s.category FROM shop_items s WHERE s.id = inventory.item_id)
+                    WHERE category IS NULL''')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_inventory_user_category ON inventory(user_id, category)')
+        c.execute('DROP INDEX IF EXISTS idx_inventory_user_id')
+
+        # Shop menus only ever read active items
+        c.execute('DROP INDEX IF EXISTS idx_shop_items_category')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_shop_items_active_category 
+                    ON shop_items(category, price) WHERE removed_at IS NULL''')
+
+    def _migrate_inventory_quantity(self, c):
+        # One row per (user, item) with a quantity; duplicate rows are merged.
+        # is_removed_item is not part of the key since the catalog was unified
+        c.execute('''CREATE TABLE inventory_stacked
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     user_id TEXT NOT NULL,
+                     item_id INTEGER NOT NULL,
+                     properties TEXT,
+                     obtained_timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+                     is_removed_item BOOLEAN DEFAULT 0,
+                     category TEXT,
+                     quantity INTEGER NOT NULL DEFAULT 1 CHECK (quantity > 0),
+                     UNIQUE (user_id, item_id),
+                     FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+        c.execute('''INSERT INTO inventory_stacked 
+                    (id, user_id, item_id, properties, obtained_timestamp, is_removed_item, category, quantity)
+                    SELECT MIN(id), user_id, item_id, MAX(properties), MIN(obtained_timestamp),
+                           MAX(is_removed_item), MAX(category), COUNT(*)
+                    FROM inventory
+                    GROUP BY user_id, item_id''')
+        c.execute('DROP TABLE inventory')
+        c.execute('ALTER TABLE inventory_stacked RENAME TO inventory')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_inventory_item_id ON inventory(item_id)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_inventory_user_category ON inventory(user_id, category)')
+
+    def _migrate_audit_outbox(self, c):
+        # Log channel embeds written in the same transaction as the change they describe
+        c.execute('''CREATE TABLE IF NOT EXISTS audit_outbox
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     event_type TEXT NOT NULL,
+                     payload TEXT NOT NULL,
+                     created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                     sent_at TEXT)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_audit_outbox_pending 
+                    ON audit_outbox(id) WHERE sent_at IS NULL''')
+
+    def _migrate_audit_pruning(self, c):
+        # Delivered rows are deleted once they're older than audit_retention_days
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_audit_outbox_sent 
+                    ON audit_outbox(sent_at) WHERE sent_at IS NOT NULL''')
+
+    def _migrate_idempotency_keys(self, c):
+        # Money-moving commands record the Discord interaction that caused them, plus the
+        # resulting balance, so a replayed interaction can be answered from the ledger
+        if not self._column_exists(c.connection, 'transactions', 'idempotency_key'):
+            c.execute('ALTER TABLE transactions ADD COLUMN idempotency_key TEXT')
+        if not self._column_exists(c.connection, 'transactions', 'balance_after'):
+            c.execute('ALTER TABLE transactions ADD COLUMN balance_after INTEGER')
+        c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_idempotency_key 
+                    ON transactions(idempotency_key) WHERE idempotency_key IS NOT NULL''')
+
+    def _migrate_cooldown_expiries(self, conn):
+        # Cooldowns are stored as expiry times in epoch seconds; the ISO timestamp columns
+        # (last use, in local time) are legacy and no longer maintained
+        for column in CooldownEngine.COLUMNS.values():
+            if not self._column_exists(conn, 'cooldowns', column):
+                conn.execute(f'ALTER TABLE cooldowns ADD COLUMN {column} INTEGER')
+        self._backfill_in_chunks(conn, 'cooldowns',
+                                 "work_until = CAST(strftime('%s', work_cooldown, 'utc') AS INTEGER) + ?, "
+                                 "income_until = CAST(strftime('%s', income_cooldown, 'utc') AS INTEGER) + ?",
+                                 (self.cooldowns.durations['work'], self.cooldowns.durations['income']))
+
+    def _migrate_cooldown_reminders(self, c):
+        # Opt-in flags for cooldown reminder DMs; the partial indexes hold only opted-in
+        # users, so loading the reminders at startup never reads the rest of the table
+        for kind, column in CooldownEngine.REMINDER_COLUMNS.items():
+            if not self._column_exists(c.connection, 'cooldowns', column):
+                c.execute(f'ALTER TABLE cooldowns ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+            c.execute(f'''CREATE INDEX IF NOT EXISTS idx_cooldowns_{column} 
+                        ON cooldowns(user_id, {CooldownEngine.COLUMNS[kind]}) WHERE {column} = 1''')
+
+    def _migrate_user_stats(self, conn):
+        # Per-user ledger aggregates, kept current by _log_transaction, so the transactions
+        # and income leaderboards read the top of an index instead of grouping the ledger
+        conn.execute('''CREATE TABLE IF NOT EXISTS user_stats
+                        (user_id TEXT PRIMARY KEY,
+                         transaction_count INTEGER NOT NULL DEFAULT 0,
+                         lifetime_income INTEGER NOT NULL DEFAULT 0)''')
+        # Chunks add to the totals, so start over if an earlier run was interrupted
+        conn.execute('DELETE FROM user_stats')
+        self._in_rowid_chunks(conn, 'transactions',
+                              '''INSERT INTO user_stats (user_id, transaction_count, lifetime_income)
+                                 SELECT user_id, COUNT(*), COALESCE(SUM(CASE WHEN type = 'income' THEN amount END), 0)
+                                 FROM transactions 
+                                 WHERE rowid > ? AND rowid <= ?
+                                 GROUP BY user_id
+                                 ON CONFLICT(user_id) DO UPDATE SET
+                                     transaction_count = transaction_count + excluded.transaction_count,
+                                     lifetime_income = lifetime_income + excluded.lifetime_income''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_user_stats_transaction_count ON user_stats(transaction_count DESC)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_user_stats_lifetime_income ON user_stats(lifetime_income DESC)')
+        # Only the old income leaderboard read this one
+        conn.execute('DROP INDEX IF EXISTS idx_transactions_type_user')
+
+    def _migrate_ledger_rollups(self, conn):
+        # Per-user, per-day (UTC days since the epoch) ledger buckets, appended to by
+        # _log_transaction; windowed leaderboards sum a bounded range of days
+        conn.execute('''CREATE TABLE IF NOT EXISTS ledger_rollups
+                        (day INTEGER NOT NULL,
+                         user_id TEXT NOT NULL,
+                         transaction_count INTEGER NOT NULL DEFAULT 0,
+                         income INTEGER NOT NULL DEFAULT 0,
+                         PRIMARY KEY (day, user_id)) WITHOUT ROWID''')
+        # Chunks add to the buckets, so start over if an earlier run was interrupted
+        conn.execute('DELETE FROM ledger_rollups')
+        self._in_rowid_chunks(conn, 'transactions',
+                              '''INSERT INTO ledger_rollups (day, user_id, transaction_count, income)
+                                 SELECT CAST(strftime('%s', timestamp) AS INTEGER) / 86400, user_id, COUNT(*),
+                                        COALESCE(SUM(CASE WHEN type = 'income' THEN amount END), 0)
+                                 FROM transactions 
+                                 WHERE timestamp IS NOT NULL AND rowid > ? AND rowid <= ?
+                                 GROUP BY 1, user_id
+                                 ON CONFLICT(day, user_id) DO UPDATE SET
+                                     transaction_count = transaction_count + excluded.transaction_count,
+                                     income = income + excluded.income''')
+
+    def _update_username(self, c, user_id: str, username: str):
+        c.execute('''INSERT INTO users (user_id, username) 
+                    VALUES (?, ?)
+                    ON CONFLICT(user_id) 
+                    DO UPDATE SET username = ?''',
+                 (user_id, username, username))
+        self.writer.after_commit(functools.partial(self.ranks.rename, user_id, username))
 
     @contextmanager
-    def get_db_connection(self):
-        """Context manager for database connections"""
-        conn = None
+    def get_db_connection(self, pooled: bool = True):
+        """Context manager for pooled database connections"""
+        conn = self.pool.acquire() if pooled else self.pool.create_connection()
+        broken = False
         try:
-            conn = sqlite3.connect('bank.db', timeout=60.0)
-            conn.row_factory = sqlite3.Row
-            conn.execute('PRAGMA journal_mode=WAL')
-            conn.execute('PRAGMA busy_timeout=30000')
-            conn.execute('PRAGMA synchronous=NORMAL')
             yield conn
             conn.commit()
         except Exception as e:
-            if conn:
-                try:
-                    conn.rollback()
-                except:
-                    pass
+            # Connections that hit a database error are recycled instead of reused
+            broken = isinstance(e, sqlite3.Error)
+            try:
+                conn.rollback()
+            except:
+                broken = True
             raise e
         finally:
-            if conn:
-                try:
-                    conn.close()
-                except:
-                    pass
+            if pooled:
+                self.pool.release(conn, broken=broken)
+            else:
+                self.pool.discard(conn)
 
     def safe_execute(self, query, params=None):
-        """Safe database execution with retries"""
-        retries = 0
-        while retries < self.max_retries:
-            try:
-                with self.get_db_connection() as conn:
-                    c = conn.cursor()
-                    if params:
-                        c.execute(query, params)
-                    else:
-                        c.execute(query)
-                    return c.fetchall()
-            except sqlite3.OperationalError as e:
-                retries += 1
-                if retries == self.max_retries:
-                    print(f"Failed after {retries} retries: {e}")
-                    raise e
-                time.sleep(self.retry_delay)
+        """Run a single query; call it through run_db to get async retries on lock contention"""
+        with self.get_db_connection() as conn:
+            c = conn.cursor()
+            if params:
+                c.execute(query, params)
+            else:
+                c.execute(query)
+            return c.fetchall()
 
     def get_balance(self, user_id: str) -> int:
         """Get total balance in knuts"""
         with self.get_db_connection() as conn:
             c = conn.cursor()
-            c.execute('SELECT galleons, sickles, knuts FROM users WHERE user_id = ?', (user_id,))
+            c.execute('SELECT balance_knuts FROM users WHERE user_id = ?', (user_id,))
             result = c.fetchone()
-            
-            if result:
-                galleons, sickles, knuts = result
-                return (galleons * self.KNUTS_PER_GALLEON + 
-                       sickles * self.KNUTS_PER_SICKLE + 
-                       knuts)
-            return 0
-
-    def update_balance(self, user_id: str, knuts_amount: int, username: str = None):
-        """Update user balance by converting to proper denominations"""
+            return result[0] if result else 0
+
+    def _update_balance(self, c, user_id: str, knuts_amount: int, username: str = None, audit=None) -> int:
+        # Update in place; removing more than the balance leaves the account at zero
+        c.execute('''UPDATE users 
+                    SET balance_knuts = MAX(balance_knuts + ?, 0)
+                    WHERE user_id = ?''',
+                 (knuts_amount, user_id))
+        if c.rowcount == 0:
+            # Create new user with username if doesn't exist
+            c.execute('''INSERT INTO users (user_id, username, balance_knuts)
+                        VALUES (?, ?, MAX(?, 0))''', (user_id, username, knuts_amount))
+        
+        c.execute('SELECT balance_knuts FROM users WHERE user_id = ?', (user_id,))
+        new_balance = c.fetchone()[0]
+        self.writer.after_commit(functools.partial(self._ranking_changed, 'wealth', user_id, new_balance, username))
+        self._queue_audit(c, 'balance', audit, new_balance)
+        return new_balance
+
+    def _adjust_balance(self, c, user_id: str, username: str, knuts_amount: int, type: str,
+                        modifier_id: str, details: str, audit=None, idempotency_key: str = None) -> tuple:
+        replay = self._find_replay(c, idempotency_key)
+        if replay:
+            amount, balance_after = replay
+            return max(balance_after - amount, 0), balance_after
+        
+        c.execute('SELECT balance_knuts FROM users WHERE user_id = ?', (user_id,))
+        result = c.fetchone()
+        old_balance = result[0] if result else 0
+        new_balance = self._update_balance(c, user_id, knuts_amount, username)
+        self._log_transaction(c, user_id, knuts_amount, type, modifier_id, details,
+                              idempotency_key=idempotency_key, balance_after=new_balance)
+        self._queue_audit(c, type, audit, new_balance)
+        return old_balance, new_balance
+
+    def _find_replay(self, c, idempotency_key: str):
+        """(amount, balance_after) of the ledger row written under this key, if any"""
+        if idempotency_key is None:
+            return None
+        c.execute('SELECT amount, balance_after FROM transactions WHERE idempotency_key = ?',
+                  (idempotency_key,))
+        return c.fetchone()
+
+    def _queue_audit(self, c, event_type: str, audit, *args):
+        """Write a log channel embed to the outbox inside the caller's transaction"""
+        if audit is None:
+            return
+        embed = audit(*args) if callable(audit) else audit
+        c.execute('''INSERT INTO audit_outbox (event_type, payload) 
+                    VALUES (?, ?)''', (event_type, json.dumps(embed.to_dict())))
+
+    def get_pending_audit(self, after_id: int = 0, limit: int = 50) -> list:
+        """Get (id, payload) outbox rows not yet posted to the log channel"""
         with self.get_db_connection() as conn:
             c = conn.cursor()
-            try:
-                # Start transaction
-                c.execute('BEGIN TRANSACTION')
-                
-                # Get current balance
-                c.execute('SELECT galleons, sickles, knuts FROM users WHERE user_id = ?', (user_id,))
-                result = c.fetchone()
-                if result:
-                    current_galleons, current_sickles, current_knuts = result
-                else:
-                    # Create new user with username if doesn't exist
-                    c.execute('''INSERT INTO users (user_id, username, galleons, sickles, knuts)
-                                VALUES (?, ?, 0, 0, 0)''', (user_id, username))
-                    current_galleons = current_sickles = current_knuts = 0
-                
-                # Calculate total knuts
-                total_knuts = (current_galleons * self.KNUTS_PER_GALLEON + 
-                              current_sickles * self.KNUTS_PER_SICKLE + 
-                              current_knuts + knuts_amount)
-                
-                if total_knuts < 0:
-                    total_knuts = 0
-                
-                # Convert to denominations
-                new_galleons = total_knuts // self.KNUTS_PER_GALLEON
-                remaining = total_knuts % self.KNUTS_PER_GALLEON
-                new_sickles = remaining // self.KNUTS_PER_SICKLE
-                new_knuts = remaining % self.KNUTS_PER_SICKLE
-                
-                # Update database
-                c.execute('''UPDATE users 
-                            SET galleons = ?, sickles = ?, knuts = ?
-                            WHERE user_id = ?''',
-                         (new_galleons, new_sickles, new_knuts, user_id))
-                
-                # Commit transaction
-                conn.commit()
-                
-                return new_galleons, new_sickles, new_knuts
-                
-            except Exception as e:
-                conn.rollback()
-                print(f"Error updating balance: {e}")
-                raise
+            c.execute('''SELECT id, payload FROM audit_outbox 
+                         WHERE sent_at IS NULL AND id > ?
+                         ORDER BY id
+                         LIMIT ?''', (after_id, limit))
+            return c.fetchall()
+
+    def _mark_audit_sent(self, c, ids: list):
+        c.executemany("UPDATE audit_outbox SET sent_at = datetime('now') WHERE id = ?",
+                      [(audit_id,) for audit_id in ids])
+        c.execute('''DELETE FROM audit_outbox 
+                     WHERE sent_at IS NOT NULL AND sent_at < datetime('now', ?)''',
+                  (f'-{self.audit_retention_days} days',))
 
     def convert_to_all_denominations(self, knuts: int) -> tuple:
         """Convert knuts to galleons, sickles, and remaining knuts"""
@@ -401,56 +1802,103 @@ class BankSystem:
         
         return (galleons * self.KNUTS_PER_GALLEON) + (sickles * self.KNUTS_PER_SICKLE) + final_knuts
 
-    def get_cooldown(self, user_id: str, cooldown_type: str) -> str:
-        try:
-            with self.get_db_connection() as conn:
-                c = conn.cursor()
-                c.execute(f'SELECT {cooldown_type} FROM cooldowns WHERE user_id = ?', (user_id,))
-                result = c.fetchone()
-                return result[0] if result else None
-        except Exception as e:
-            print(f"Error getting cooldown: {e}")
-            return None
-
-    def set_cooldown(self, user_id: str, cooldown_type: str, time: str):
-        try:
-            with self.get_db_connection() as conn:
-                c = conn.cursor()
-                c.execute('''INSERT INTO cooldowns (user_id, ''' + cooldown_type + ''')
-                           VALUES (?, ?)
-                           ON CONFLICT(user_id) 
-                           DO UPDATE SET ''' + cooldown_type + ''' = ?''',
-                        (user_id, time, time))
-                conn.commit()
-        except Exception as e:
-            print(f"Error setting cooldown: {e}")
-            raise
-
-    def log_transaction(self, user_id: str, amount: int, type: str, modifier_id: str, details: str):
-        """Log a transaction with proper connection and transaction handling."""
+    def get_cooldowns(self, user_id: str) -> dict:
+        """Stored cooldown expiries (epoch seconds) for a user, by kind"""
         with self.get_db_connection() as conn:
             c = conn.cursor()
-            try:
-                c.execute('BEGIN TRANSACTION')
-                c.execute('''INSERT INTO transactions 
-                            (user_id, amount, type, timestamp, modifier_id, details)
-                            VALUES (?, ?, ?, datetime('now'), ?, ?)''',
-                         (user_id, amount, type, modifier_id, details))
-                conn.commit()
-            except Exception as e:
-                conn.rollback()
-                print(f"Error logging transaction: {e}")
-                raise
+            c.execute('SELECT work_until, income_until FROM cooldowns WHERE user_id = ?', (user_id,))
+            result = c.fetchone()
+            return dict(zip(CooldownEngine.COLUMNS, result)) if result else {}
 
-    def update_profile(self, user_id: str, favorite_spells: str, pets: str, bio: str):
-        """Update user profile information."""
+    def get_reminder_rows(self) -> list:
+        """(user_id, kind, cooldown expiry) for every reminder opt-in"""
         with self.get_db_connection() as conn:
             c = conn.cursor()
-            c.execute('''UPDATE users 
-                         SET favorite_spells = ?, pets = ?, bio = ?
-                         WHERE user_id = ?''',
-                       (favorite_spells, pets, bio, user_id))
-            conn.commit()
+            c.execute('''SELECT user_id, 'work', work_until FROM cooldowns WHERE remind_work = 1
+                         UNION ALL
+                         SELECT user_id, 'income', income_until FROM cooldowns WHERE remind_income = 1''')
+            return c.fetchall()
+
+    def _set_reminder(self, c, user_id: str, kind: str, enabled: bool):
+        column = CooldownEngine.REMINDER_COLUMNS[kind]
+        c.execute(f'''INSERT INTO cooldowns (user_id, {column})
+                   VALUES (?, ?)
+                   ON CONFLICT(user_id) 
+                   DO UPDATE SET {column} = excluded.{column}''',
+                (user_id, int(enabled)))
+
+    def _log_transaction(self, c, user_id: str, amount: int, type: str, modifier_id: str, details: str,
+                         audit=None, idempotency_key: str = None, balance_after: int = None):
+        c.execute('''INSERT INTO transactions 
+                    (user_id, amount, type, timestamp, modifier_id, details, idempotency_key, balance_after)
+                    VALUES (?, ?, ?, datetime('now'), ?, ?, ?, ?)''',
+                 (user_id, amount, type, modifier_id, details, idempotency_key, balance_after))
+        # Leaderboard aggregates move with every ledger row
+        c.execute('''INSERT INTO user_stats (user_id, transaction_count, lifetime_income)
+                    VALUES (?, 1, ?)
+                    ON CONFLICT(user_id) 
+                    DO UPDATE SET transaction_count = transaction_count + 1,
+                                  lifetime_income = lifetime_income + excluded.lifetime_income''',
+                 (user_id, amount if type == 'income' else 0))
+        c.execute('''INSERT INTO ledger_rollups (day, user_id, transaction_count, income)
+                    VALUES (?, ?, 1, ?)
+                    ON CONFLICT(day, user_id) 
+                    DO UPDATE SET transaction_count = transaction_count + 1,
+                                  income = income + excluded.income''',
+                 (int(time.time()) // 86400, user_id, amount if type == 'income' else 0))
+        c.execute('SELECT transaction_count, lifetime_income FROM user_stats WHERE user_id = ?', (user_id,))
+        transaction_count, lifetime_income = c.fetchone()
+        self.writer.after_commit(functools.partial(self._ranking_changed, 'transactions', user_id, transaction_count))
+        self.writer.after_commit(functools.partial(self._ranking_changed, 'income', user_id, lifetime_income))
+        self._queue_audit(c, type, audit)
+
+    def _cooldown_window(self, kind: str, now: datetime) -> tuple:
+        now_epoch = int(now.timestamp())
+        return now_epoch, now_epoch + self.cooldowns.durations[kind]
+
+    def _cooldown_result(self, user_id: str, kind: str, until: int, result: tuple) -> tuple:
+        # The transaction's outcome is the stored expiry: ours if it stamped one, the existing
+        # one if not. A replay (from the ledger or the idempotency cache) stamped nothing new.
+        done, value, stamped = result
+        if not done:
+            self.cooldowns.set(user_id, kind, value)
+        elif stamped == until:
+            self.cooldowns.set(user_id, kind, until)
+            self.reminders.schedule(user_id, kind, until)
+        return done, value
+
+    def _perform_cooldown_credit(self, c, user_id: str, username: str, knuts_amount: int,
+                                 kind: str, now_epoch: int, until: int, type: str,
+                                 details: str, audit=None, idempotency_key: str = None) -> tuple:
+        """(done, balance or existing expiry, expiry stamped by this call or None)"""
+        replay = self._find_replay(c, idempotency_key)
+        if replay:
+            return True, replay[1], None
+        
+        # Stamp the new expiry only if the stored one has run out; that stamp is the
+        # cooldown check, so it also holds across restarts and other processes
+        column = CooldownEngine.COLUMNS[kind]
+        c.execute(f'''INSERT INTO cooldowns (user_id, {column})
+                    VALUES (?, ?)
+                    ON CONFLICT(user_id) 
+                    DO UPDATE SET {column} = excluded.{column}
+                    WHERE cooldowns.{column} IS NULL OR cooldowns.{column} <= ?''',
+                 (user_id, until, now_epoch))
+        if c.rowcount == 0:
+            c.execute(f'SELECT {column} FROM cooldowns WHERE user_id = ?', (user_id,))
+            return False, c.fetchone()[0], None
+        
+        new_balance = self._update_balance(c, user_id, knuts_amount, username)
+        self._log_transaction(c, user_id, knuts_amount, type, user_id, details,
+                              idempotency_key=idempotency_key, balance_after=new_balance)
+        self._queue_audit(c, type, audit, new_balance)
+        return True, new_balance, until
+
+    def _update_profile(self, c, user_id: str, favorite_spells: str, pets: str, bio: str):
+        c.execute('''UPDATE users 
+                     SET favorite_spells = ?, pets = ?, bio = ?
+                     WHERE user_id = ?''',
+                   (favorite_spells, pets, bio, user_id))
 
     def get_profile(self, user_id: str) -> dict:
         """Retrieve user profile information."""
@@ -468,114 +1916,518 @@ class BankSystem:
             return None
 
     def log_to_channel(self, bot, embed):
-        """Send log message to the configured log channel"""
+        """Queue a log message for the configured log channel (sent in the background)"""
         try:
-            log_channel = bot.get_channel(self.config['log_channel_id'])
-            if log_channel:
-                return bot.loop.create_task(log_channel.send(embed=embed))
-            else:
-                print(f"Could not find log channel with ID {self.config['log_channel_id']}")
+            self.log_dispatcher.enqueue(bot, embed)
         except Exception as e:
-            print(f"Error sending log message: {e}")
+            print(f"Error queueing log message: {e}")
 
-    # Add this helper method to check if a user can afford an item
-    def can_afford_item(self, user_id: str, price: int) -> bool:
-        with self.get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute('''SELECT (galleons * ? + sickles * ? + knuts) as total_knuts 
-                         FROM users WHERE user_id = ?''',
-                      (self.KNUTS_PER_GALLEON, self.KNUTS_PER_SICKLE, user_id))
-            result = c.fetchone()
-            if not result:
-                return False
-            return result[0] >= price
+    def start_audit_drainer(self, bot):
+        """Start posting audit outbox rows to the log channel (safe to call again)"""
+        if self._audit_task is None or self._audit_task.done():
+            self._audit_wakeup = asyncio.Event()
+            self._audit_task = asyncio.get_running_loop().create_task(self._drain_audit_outbox(bot))
+
+    async def start_reminders(self, bot):
+        """Load reminder opt-ins and start the scheduler (no-op if it's already running)"""
+        if self.reminders.running:
+            return
+        rows = await self.run_db(self.get_reminder_rows)
+        self.reminders.start(rows, functools.partial(self._send_reminder, bot))
+        print(f"Loaded {len(rows)} cooldown reminder opt-in(s), {self.reminders.pending} scheduled")
+
+    async def _send_reminder(self, bot, user_id: str, kind: str):
+        user = bot.get_user(int(user_id)) or await bot.fetch_user(int(user_id))
+        if kind == 'work':
+            embed = Embed(
+                title=f"{self.work_emoji} Ready to Work",
+                description="Your work cooldown is over. Use `/work` to earn some more!",
+                color=self.info_color
+            )
+        else:
+            embed = Embed(
+                title=f"{self.bank_emoji} Income Ready",
+                description="Your weekly income is ready. Use `/collect_income` to collect it!",
+                color=self.info_color
+            )
+        embed.set_footer(text="Turn these off with /remind_me")
+        await user.send(embed=embed)
+
+    async def aset_reminder(self, user_id: str, kind: str, enabled: bool) -> int:
+        """Turn a cooldown reminder on or off; returns seconds left on that cooldown"""
+        await self.run_write(self._set_reminder, user_id, kind, enabled)
+        remaining = await self.acooldown_remaining(user_id, kind)
+        if enabled:
+            self.reminders.opt_in(user_id, kind, int(time.time()) + remaining if remaining else None)
+        else:
+            self.reminders.opt_out(user_id, kind)
+        return remaining
+
+    def _wake_audit_drainer(self):
+        if self._audit_wakeup is not None:
+            self._audit_wakeup.set()
+
+    def _audit_done(self, audit_id: int, delivered: bool):
+        if delivered:
+            self._audit_retry.pop(audit_id, None)
+            self._audit_delivered.append(audit_id)
+            self._wake_audit_drainer()
+        else:
+            # Leave the row pending and retry it on a later poll, backing off per row so a
+            # missing or forbidden log channel isn't hammered with the same entries
+            self._audit_in_flight.discard(audit_id)
+            attempts = self._audit_retry.get(audit_id, (0, 0))[0] + 1
+            delay = min(self.audit_poll_interval * 2 ** (attempts - 1), self.audit_retry_max_delay)
+            self._audit_retry[audit_id] = (attempts, time.monotonic() + delay)
+
+    async def _drain_audit_outbox(self, bot):
+        """Deliver pending outbox rows at least once, marking them sent after Discord accepts them"""
+        while True:
+            self._audit_wakeup.clear()
+            try:
+                if self._audit_delivered:
+                    ids, self._audit_delivered = self._audit_delivered, []
+                    try:
+                        await self.run_write(self._mark_audit_sent, ids)
+                    finally:
+                        self._audit_in_flight.difference_update(ids)
+                
+                now = time.monotonic()
+                due = [audit_id for audit_id, (_, at) in self._audit_retry.items() if at <= now]
+                if due:
+                    self._audit_cursor = min(self._audit_cursor, min(due) - 1)
+                
+                rows = await self.run_db(self.get_pending_audit, self._audit_cursor)
+                for audit_id, payload in rows:
+                    self._audit_cursor = max(self._audit_cursor, audit_id)
+                    if audit_id in self._audit_in_flight or self._audit_retry.get(audit_id, (0, 0))[1] > now:
+                        continue
+                    self._audit_in_flight.add(audit_id)
+                    self.log_dispatcher.enqueue(bot, Embed.from_dict(json.loads(payload)),
+                                                on_done=functools.partial(self._audit_done, audit_id))
+                if len(rows) == 50:
+                    continue
+            except Exception as e:
+                print(f"Error draining audit outbox: {e}")
+                self._audit_cursor = 0
+            
+            try:
+                await asyncio.wait_for(self._audit_wakeup.wait(), timeout=self.audit_poll_interval)
+            except asyncio.TimeoutError:
+                pass
 
     # Add this helper method to get item details
     def get_item_details(self, item_id: int) -> dict:
+        return self.catalog.get(item_id)
+
+    def _add_to_inventory(self, c, user_id: str, item_id: int, category: str):
+        c.execute('''INSERT INTO inventory 
+                    (user_id, item_id, category) 
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + 1''',
+                 (user_id, item_id, category))
+        return True
+
+    def _process_purchase(self, c, user_id: str, item_id: int, category: str, price: int, name: str,
+                          audit=None, idempotency_key: str = None) -> bool:
+        if self._find_replay(c, idempotency_key):
+            return True
+
+        # Debit only if the balance covers the price and the item is still for sale
+        c.execute('''UPDATE users 
+                   SET balance_knuts = balance_knuts - ?
+                   WHERE user_id = ? AND balance_knuts - ? >= 0
+                   AND EXISTS (SELECT 1 FROM shop_items WHERE id = ? AND removed_at IS NULL)''',
+                (price, user_id, price, item_id))
+        if c.rowcount == 0:
+            return False
+
+        # Add to inventory
+        c.execute('''INSERT INTO inventory 
+                   (user_id, item_id, category) 
+                   VALUES (?, ?, ?)
+                   ON CONFLICT(user_id, item_id) DO UPDATE SET quantity = quantity + 1''',
+                (user_id, item_id, category))
+
+        # Log transaction
+        c.execute('SELECT balance_knuts FROM users WHERE user_id = ?', (user_id,))
+        balance_after = c.fetchone()[0]
+        self.writer.after_commit(functools.partial(self._ranking_changed, 'wealth', user_id, balance_after))
+        self._log_transaction(c, user_id, -price, 'purchase', user_id, f"Purchased {name}", audit=audit,
+                              idempotency_key=idempotency_key, balance_after=balance_after)
+        return True
+
+    def get_catalog_rows(self) -> list:
+        """Load every active shop item (used to fill the catalog cache)"""
         with self.get_db_connection() as conn:
             c = conn.cursor()
             c.execute('''SELECT id, name, price, category, description, properties, required_role 
-                         FROM shop_items WHERE id = ?''', (item_id,))
-            result = c.fetchone()
-            if not result:
-                return None
-            return dict(result)
+                         FROM shop_items 
+                         WHERE removed_at IS NULL''')
+            return c.fetchall()
+
+    def get_shop_categories(self) -> list:
+        """Get (category, item count) pairs for the shop menu"""
+        return self.catalog.categories()
+
+    def get_category_names(self, exclude_defaults: bool = False) -> list:
+        """Get the distinct shop categories, optionally without Wands/Brooms/Accessories"""
+        return self.catalog.category_names(exclude_defaults)
+
+    def get_shop_items(self, category: str, order_by: str = 'price') -> list:
+        """Get (id, name, price, description, required_role, price_text) rows for a category"""
+        return self.catalog.items(category, order_by)
+
+    def _catalog_item_added(self, item_id: int, name: str, price: int, category: str, description: str,
+                            properties: dict = None, required_role: str = None):
+        self.catalog.item_added({
+            'id': item_id, 'name': name, 'price': price, 'category': category,
+            'description': description,
+            'properties': json.dumps(properties) if properties is not None else None,
+            'required_role': required_role
+        })
+
+    def _add_shop_item(self, c, name: str, price: int, category: str, description: str,
+                       added_by: str, properties: dict = None, required_role: str = None) -> int:
+        c.execute('''INSERT INTO shop_items 
+                    (name, price, category, description, properties, added_by, required_role)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                 (name, price, category, description,
+                  json.dumps(properties) if properties is not None else None,
+                  added_by, required_role))
+        return c.lastrowid
 
-    # Add this helper method to add item to inventory
-    def add_to_inventory(self, user_id: str, item_id: int, category: str):
+    def get_item_owner_count(self, item_id: int) -> int:
+        """Count users holding an item"""
         with self.get_db_connection() as conn:
             c = conn.cursor()
-            try:
-                c.execute('BEGIN TRANSACTION')
-                c.execute('''INSERT INTO inventory 
-                            (user_id, item_id, category) 
-                            VALUES (?, ?, ?)''',
-                         (user_id, item_id, category))
-                conn.commit()
-                return True
-            except Exception as e:
-                conn.rollback()
-                print(f"Error adding item to inventory: {e}")
-                return False
+            c.execute('SELECT COUNT(*) FROM inventory WHERE item_id = ?', (item_id,))
+            return c.fetchone()[0]
 
-    def process_purchase(self, user_id: str, item_id: int, category: str, price: int, name: str, description: str = None) -> bool:
-        """Process a purchase atomically. Returns True if successful, False otherwise."""
+    def _remove_shop_item(self, c, item_id: int, audit=None) -> bool:
+        c.execute('''UPDATE shop_items 
+                   SET removed_at = datetime('now') 
+                   WHERE id = ? AND removed_at IS NULL''', (item_id,))
+        if c.rowcount == 0:
+            return False
+        self._queue_audit(c, 'remove_item', audit)
+        return True
+
+    def get_profile_items(self, user_id: str) -> tuple:
+        """Get (wand, accessories, broom, other items) for a user's profile"""
         with self.get_db_connection() as conn:
             c = conn.cursor()
-            try:
-                # Check balance
-                c.execute('''SELECT (galleons * ? + sickles * ? + knuts) as total_knuts 
-                            FROM users WHERE user_id = ?''',
-                         (self.KNUTS_PER_GALLEON, self.KNUTS_PER_SICKLE, user_id))
-                result = c.fetchone()
-                current_balance = result[0] if result else 0
-
-                if current_balance < price:
-                    return False
-
-                # Calculate new balance
-                new_total = current_balance - price
-                new_galleons = new_total // self.KNUTS_PER_GALLEON
-                remaining = new_total % self.KNUTS_PER_GALLEON
-                new_sickles = remaining // self.KNUTS_PER_SICKLE
-                new_knuts = remaining % self.KNUTS_PER_SICKLE
-
-                # Update balance
-                c.execute('''UPDATE users 
-                           SET galleons = ?, sickles = ?, knuts = ?
-                           WHERE user_id = ?''',
-                        (new_galleons, new_sickles, new_knuts, user_id))
-
-                # Add to inventory
-                c.execute('''INSERT INTO inventory 
-                           (user_id, item_id, category) 
-                           VALUES (?, ?, ?)''',
-                        (user_id, item_id, category))
-
-                # Log transaction
-                c.execute('''INSERT INTO transactions 
-                           (user_id, amount, type, timestamp, modifier_id, details)
-                           VALUES (?, ?, ?, datetime('now'), ?, ?)''',
-                        (user_id, -price, 'purchase', user_id, f"Purchased {name}"))
-
-                return True
+            
+            # Get wand info
+            c.execute('''
+                SELECT s.name, s.properties
+                FROM inventory i
+                JOIN shop_items s ON s.id = i.item_id
+                WHERE i.user_id = ? AND i.category = 'Wands'
+            ''', (user_id,))
+            wand = c.fetchone()
+            
+            # Get accessories (separate query)
+            c.execute('''
+                SELECT s.name, s.properties, s.description, i.quantity
+                FROM inventory i
+                JOIN shop_items s ON s.id = i.item_id
+                WHERE i.user_id = ? AND i.category = 'Accessories'
+                ORDER BY s.name
+            ''', (user_id,))
+            accessories = c.fetchall()
+            
+            # Get broom info
+            c.execute('''
+                SELECT s.name, s.properties
+                FROM inventory i
+                JOIN shop_items s ON s.id = i.item_id
+                WHERE i.user_id = ? AND i.category = 'Brooms'
+            ''', (user_id,))
+            broom = c.fetchone()
+            
+            # Get other inventory items
+            c.execute('''
+                SELECT s.name, s.description, i.category, i.quantity
+                FROM inventory i
+                JOIN shop_items s ON s.id = i.item_id
+                WHERE i.user_id = ? 
+                AND i.category NOT IN ('Wands', 'Brooms', 'Accessories')
+                ORDER BY i.category, s.name
+            ''', (user_id,))
+            inventory_items = c.fetchall()
+            
+            return wand, accessories, broom, inventory_items
 
-            except Exception as e:
-                print(f"Error processing purchase: {e}")
-                return False
+    def get_inventory_by_category(self, user_id: str, category: str) -> list:
+        """Get (name, properties, inventory id, category, quantity) rows for one category"""
+        with self.get_db_connection() as conn:
+            c = conn.cursor()
+            # Removed items are still in shop_items, so one join covers both
+            c.execute('''
+                SELECT s.name, s.properties, i.id, i.category, i.quantity
+                FROM inventory i
+                JOIN shop_items s ON s.id = i.item_id
+                WHERE i.user_id = ? AND i.category = ?
+            ''', (user_id, category))
+            return c.fetchall()
+
+    def get_usable_items(self, user_id: str) -> list:
+        """Get (inventory id, name, description, category, properties, quantity) rows for consumables"""
+        with self.get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute('''
+                SELECT i.id, s.name, s.description, i.category, s.properties, i.quantity
+                FROM inventory i
+                JOIN shop_items s ON s.id = i.item_id
+                WHERE i.user_id = ? 
+                AND i.category NOT IN ('Wands', 'Brooms', 'Accessories')
+            ''', (user_id,))
+            return c.fetchall()
+
+    def _remove_from_inventory(self, c, inventory_id: int) -> bool:
+        c.execute('''UPDATE inventory 
+                   SET quantity = quantity - 1 
+                   WHERE id = ? AND quantity > 1''', (inventory_id,))
+        if c.rowcount == 0:
+            c.execute('DELETE FROM inventory WHERE id = ?', (inventory_id,))
+        return c.rowcount > 0
+
+    def _ranking_changed(self, metric: str, user_id: str, value: int, username: str = None):
+        # After-commit hook for every write that moves a leaderboard value
+        self.ranks.update(metric, user_id, value, username)
+        self.leaderboards.invalidate(metric, user_id, value)
+
+    def get_rank_rows(self) -> list:
+        """(user_id, username, balance, transaction count, lifetime income) for every user"""
+        with self.get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute('''SELECT u.user_id, u.username, u.balance_knuts, s.transaction_count, s.lifetime_income
+                         FROM users u
+                         LEFT JOIN user_stats s ON s.user_id = u.user_id''')
+            return c.fetchall()
+
+    # Leaderboard windows in days; all-time reads the user_stats aggregates instead
+    LEADERBOARD_WINDOWS = {'weekly': 7, 'monthly': 30}
+
+    def get_leaderboard(self, category: str, window: str = 'all-time') -> list:
+        """Get the top 10 (user_id, username, value) rows for a leaderboard category
+        
+        Each is a range read from the top of an index (users.balance_knuts or the
+        user_stats aggregates), independent of the size of the ledger. Weekly and
+        monthly transactions/income sum at most that many days of ledger_rollups.
+        """
+        with self.get_db_connection() as conn:
+            c = conn.cursor()
+            
+            if category != "wealth" and window in self.LEADERBOARD_WINDOWS:
+                column = 'transaction_count' if category == "transactions" else 'income'
+                first_day = int(time.time()) // 86400 - self.LEADERBOARD_WINDOWS[window] + 1
+                c.execute(f'''
+                    SELECT r.user_id, u.username, SUM(r.{column}) as total
+                    FROM ledger_rollups r
+                    JOIN users u ON r.user_id = u.user_id
+                    WHERE r.day >= ?
+                    GROUP BY r.user_id
+                    HAVING total > 0
+                    ORDER BY total DESC LIMIT 10
+                ''', (first_day,))
+            
+            elif category == "wealth":
+                c.execute('''
+                    SELECT user_id, username, balance_knuts
+                    FROM users 
+                    WHERE balance_knuts > 0
+                    ORDER BY balance_knuts DESC LIMIT 10
+                ''')
+            
+            elif category == "transactions":
+                c.execute('''
+                    SELECT s.user_id, u.username, s.transaction_count
+                    FROM user_stats s
+                    JOIN users u ON s.user_id = u.user_id
+                    WHERE s.transaction_count > 0
+                    ORDER BY s.transaction_count DESC LIMIT 10
+                ''')
+            
+            else:  # income
+                c.execute('''
+                    SELECT s.user_id, u.username, s.lifetime_income
+                    FROM user_stats s
+                    JOIN users u ON s.user_id = u.user_id
+                    WHERE s.lifetime_income > 0
+                    ORDER BY s.lifetime_income DESC LIMIT 10
+                ''')
+            
+            return c.fetchall()
+
+    # Async facade - runs the blocking sqlite calls on the DB thread pool so
+    # command handlers never stall the event loop
+    # Both are wrapped in the retry policy, which backs off with asyncio.sleep
+    async def run_db(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        return await self.retry.run('read', lambda: loop.run_in_executor(self.db_executor, call))
 
-bank = BankSystem()
+    async def run_write(self, func, *args, **kwargs):
+        """Queue a write intent and wait for its batch to commit without tying up a thread"""
+        result = await self.retry.run(
+            'write', lambda: asyncio.wrap_future(self.writer.submit(func, *args, **kwargs)))
+        if kwargs.get('audit') is not None:
+            self._wake_audit_drainer()
+        return result
 
+    async def run_idempotent(self, idempotency_key: str, applied, func, *args, **kwargs):
+        """run_write for money-moving intents keyed by a Discord interaction.
+        
+        A key whose result is still cached never reaches the writer. Results are cached
+        only when applied(result) is true, the same cases the ledger can replay.
+        """
+        if idempotency_key is not None:
+            cached = self.idempotency.get(idempotency_key)
+            if cached is not None:
+                return cached
+        result = await self.run_write(func, *args, idempotency_key=idempotency_key, **kwargs)
+        if idempotency_key is not None and applied(result):
+            self.idempotency.put(idempotency_key, result)
+        return result
+
+    async def aupdate_username(self, user_id: str, username: str):
+        return await self.run_write(self._update_username, user_id, username)
+
+    async def aget_balance(self, user_id: str) -> int:
+        return await self.run_db(self.get_balance, user_id)
+
+    async def aupdate_balance(self, user_id: str, knuts_amount: int, username: str = None, audit=None) -> int:
+        """Add (or remove) knuts from a balance, never going below zero. Returns the new balance.
+        
+        audit is an optional log embed (or a function of the new balance returning one)
+        that is written to the audit outbox in the same transaction.
+        """
+        try:
+            return await self.run_write(self._update_balance, user_id, knuts_amount, username, audit=audit)
+        except Exception as e:
+            print(f"Error updating balance: {e}")
+            raise
+
+    async def acooldown_remaining(self, user_id: str, kind: str) -> int:
+        """Seconds left on a user's 'work' or 'income' cooldown (0 if ready)"""
+        if not self.cooldowns.is_loaded(user_id):
+            self.cooldowns.load(user_id, await self.run_db(self.get_cooldowns, user_id))
+        return self.cooldowns.remaining(user_id, kind, int(time.time()))
+
+    async def alog_transaction(self, user_id: str, amount: int, type: str, modifier_id: str, details: str,
+                               audit=None):
+        """Log a transaction through the group-commit writer (audit as in aupdate_balance)."""
+        try:
+            return await self.run_write(self._log_transaction, user_id, amount, type, modifier_id, details,
+                                        audit=audit)
+        except Exception as e:
+            print(f"Error logging transaction: {e}")
+            raise
+
+    async def aadjust_balance(self, user_id: str, username: str, knuts_amount: int, type: str,
+                              modifier_id: str, details: str, audit=None, idempotency_key: str = None) -> tuple:
+        """Change a balance and record it in the ledger in one transaction.
+        
+        Returns (old balance, new balance). A repeated idempotency_key returns the
+        balances recorded the first time without changing anything.
+        """
+        return await self.run_idempotent(idempotency_key, lambda result: True,
+                                         self._adjust_balance, user_id, username, knuts_amount, type,
+                                         modifier_id, details, audit=audit)
+
+    async def aperform_work(self, user_id: str, username: str, knuts_amount: int, details: str, now: datetime,
+                            audit=None, idempotency_key: str = None) -> tuple:
+        """Check the work cooldown, pay, stamp the cooldown and log it in one transaction.
+        
+        Returns (True, new balance) or (False, cooldown expiry in epoch seconds) if still
+        on cooldown; either way the cooldown engine is updated with the stored expiry.
+        The audit embed (see aupdate_balance) is only written if the payment happens.
+        A repeated idempotency_key returns (True, balance recorded the first time).
+        """
+        now_epoch, until = self._cooldown_window('work', now)
+        result = await self.run_idempotent(idempotency_key, lambda result: result[0],
+                                           self._perform_cooldown_credit, user_id, username, knuts_amount,
+                                           'work', now_epoch, until, 'work', details, audit=audit)
+        return self._cooldown_result(user_id, 'work', until, result)
+
+    async def aperform_income_collection(self, user_id: str, username: str, knuts_amount: int, details: str, now: datetime,
+                                         audit=None, idempotency_key: str = None) -> tuple:
+        """Same as aperform_work, for the weekly income cooldown"""
+        now_epoch, until = self._cooldown_window('income', now)
+        result = await self.run_idempotent(idempotency_key, lambda result: result[0],
+                                           self._perform_cooldown_credit, user_id, username, knuts_amount,
+                                           'income', now_epoch, until, 'income', details, audit=audit)
+        return self._cooldown_result(user_id, 'income', until, result)
+
+    async def aget_item_details(self, item_id: int) -> dict:
+        return self.get_item_details(item_id)
+
+    async def aprocess_purchase(self, user_id: str, item_id: int, category: str, price: int, name: str, description: str = None,
+                                audit=None, idempotency_key: str = None) -> bool:
+        """Process a purchase atomically. Returns True if successful, False otherwise.
+        
+        A purchase already made under the same idempotency_key returns True without
+        charging again.
+        """
+        try:
+            return await self.run_idempotent(idempotency_key, bool, self._process_purchase,
+                                             user_id, item_id, category, price, name, audit=audit)
+        except Exception as e:
+            print(f"Error processing purchase: {e}")
+            return False
+
+    # Catalog reads are served from memory, no DB round trip
+    async def aget_shop_categories(self) -> list:
+        return self.get_shop_categories()
+
+    async def aget_category_names(self, exclude_defaults: bool = False) -> list:
+        return self.get_category_names(exclude_defaults)
+
+    async def aget_shop_items(self, category: str, order_by: str = 'price') -> list:
+        return self.get_shop_items(category, order_by)
+
+    async def aadd_shop_item(self, name: str, price: int, category: str, description: str,
+                             added_by: str, properties: dict = None, required_role: str = None) -> int:
+        """Insert a new shop item and return its id"""
+        item_id = await self.run_write(self._add_shop_item, name, price, category, description,
+                                       added_by, properties, required_role)
+        self._catalog_item_added(item_id, name, price, category, description, properties, required_role)
+        return item_id
+
+    async def aget_item_owner_count(self, item_id: int) -> int:
+        return await self.run_db(self.get_item_owner_count, item_id)
+
+    async def aremove_shop_item(self, item_id: int, audit=None) -> bool:
+        """Take an item off sale, keeping it in owners' inventories"""
+        removed = await self.run_write(self._remove_shop_item, item_id, audit=audit)
+        self.catalog.item_removed(item_id)
+        return removed
+
+    async def aget_profile_items(self, user_id: str) -> tuple:
+        return await self.run_db(self.get_profile_items, user_id)
+
+    async def aget_inventory_by_category(self, user_id: str, category: str) -> list:
+        return await self.run_db(self.get_inventory_by_category, user_id, category)
+
+    async def aget_usable_items(self, user_id: str) -> list:
+        return await self.run_db(self.get_usable_items, user_id)
+
+    async def aremove_from_inventory(self, inventory_id: int) -> bool:
+        """Take one unit off an inventory stack, deleting the row at zero"""
+        return await self.run_write(self._remove_from_inventory, inventory_id)
+
+    async def aget_leaderboard(self, category: str, window: str = 'all-time') -> list:
+        return await self.run_db(self.get_leaderboard, category, window)
 
 @bot.event
 async def on_ready():
     print(f'{bot.user} has connected to Discord!')
     try:
         # Test database connection
-        with bank.get_db_connection() as conn:
-            c = conn.cursor()
-            c.execute('SELECT 1')
-            print("Database connection successful!")
+        await bank.run_db(bank.safe_execute, 'SELECT 1')
+        print("Database connection successful!")
     except Exception as e:
         print(f"Database connection error: {e}")
         return
@@ -593,81 +2445,61 @@ async def on_ready():
     except Exception as e:
         print(f"Error syncing commands: {e}")
 
+    # Deliver any audit log entries left pending (e.g. from before a restart)
+    bank.start_audit_drainer(bot)
+    try:
+        await bank.start_reminders(bot)
+    except Exception as e:
+        print(f"Error starting cooldown reminders: {e}")
+
+    # Resolve role tiers for everyone already in the member cache
+    for guild in bot.guilds:
+        loaded = bank.members.load_guild(guild)
+        print(f"Cached role tiers for {loaded} member(s) in {guild.name}")
+
+@bot.event
+async def on_member_join(member):
+    bank.members.update(member)
+
+@bot.event
+async def on_member_update(before, after):
+    if before.roles != after.roles:
+        bank.members.update(after)
+
+@bot.event
+async def on_member_remove(member):
+    bank.members.remove(member)
+
 @bot.event
 async def on_command_error(ctx, error):
     print(f"Command error: {error}")
 
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
-    if isinstance(error, app_commands.CommandOnCooldown):
-        # Convert seconds to minutes and seconds
-        minutes = int(error.retry_after // 60)
-        seconds = int(error.retry_after % 60)
-        
-        embed = Embed(
-            title=f"{bank.time_emoji} Work Cooldown",
-            description=f"You need to rest for **{minutes}** minutes and **{seconds}** seconds before working again!",
-            color=bank.error_color
+    print(f"App command error: {error}")  # Log other errors to console
+    try:
+        await interaction.response.send_message(
+            f"An error occurred: {str(error)}", 
+            ephemeral=True
         )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-    else:
-        print(f"App command error: {error}")  # Log other errors to console
+    except:
         try:
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 f"An error occurred: {str(error)}", 
                 ephemeral=True
             )
         except:
-            try:
-                await interaction.followup.send(
-                    f"An error occurred: {str(error)}", 
-                    ephemeral=True
-                )
-            except:
-                print("Could not send error message to user")
+            print("Could not send error message to user")
 
 @bot.tree.command(name="work", description="Work to earn money")
-@app_commands.checks.cooldown(1, 14400)  # 1 use per 4 hours (4 * 60 * 60 = 14400 seconds)
 async def work(interaction: discord.Interaction):
     try:
         user_id = str(interaction.user.id)
         username = interaction.user.display_name
         current_time = datetime.now()
         
-        # Check cooldown
-        last_work = bank.get_cooldown(user_id, 'work_cooldown')
-        if last_work:
-            last_work = datetime.fromisoformat(last_work)
-            if current_time < last_work + timedelta(minutes=60):
-                remaining = (last_work + timedelta(minutes=60) - current_time).seconds // 60
-                embed = Embed(
-                    title=f"{bank.time_emoji} Work Cooldown",
-                    description=f"You need to rest for **{remaining}** minutes before working again!",
-                    color=bank.error_color
-                )
-                await interaction.response.send_message(embed=embed)
-                return
-
-        # Determine highest work role
-        work_config = bank.default_work
-        for role in interaction.user.roles:
-            if role.id in bank.config['work_roles']:
-                current_role = bank.config['work_roles'][role.id]
-                # Compare roles based on max possible earnings in knuts
-                current_max_knuts = current_role['max']
-                if current_role['currency'] == 'galleon':
-                    current_max_knuts *= bank.KNUTS_PER_GALLEON
-                elif current_role['currency'] == 'sickle':
-                    current_max_knuts *= bank.KNUTS_PER_SICKLE
-                    
-                work_max_knuts = work_config['max']
-                if work_config['currency'] == 'galleon':
-                    work_max_knuts *= bank.KNUTS_PER_GALLEON
-                elif work_config['currency'] == 'sickle':
-                    work_max_knuts *= bank.KNUTS_PER_SICKLE
-                    
-                if current_max_knuts > work_max_knuts:
-                    work_config = current_role
+        # Highest work role (ranked by max possible earnings in knuts), from the tier cache
+        work_config = bank.members.get(interaction.user).work_config
         
         # Generate earnings based on role
         amount = random.randint(work_config['min'], work_config['max'])
@@ -683,10 +2515,43 @@ async def work(interaction: discord.Interaction):
             knuts_earned = amount
             currency_name = 'Knuts'
         
-        bank.update_balance(user_id, knuts_earned, username)
-        bank.set_cooldown(user_id, 'work_cooldown', current_time.isoformat())
+        # Log embed goes to the audit outbox in the same transaction as the payment
+        log_embed = Embed(
+            title="Work Activity Log",
+            description=f"{interaction.user.mention} worked and earned {bank.format_currency(knuts_earned)}",
+            color=bank.info_color,
+            timestamp=datetime.now()
+        )
+        log_embed.set_footer(text=f"User ID: {interaction.user.id}")
+        
+        # Cooldown check from memory, then credit, conditional cooldown stamp and ledger
+        # entry in one transaction (queued behind any other money-moving command from this user)
+        async with bank.user_locks.hold(user_id):
+            remaining = await bank.acooldown_remaining(user_id, 'work')
+            if not remaining:
+                worked, result = await bank.aperform_work(
+                    user_id,
+                    username,
+                    knuts_earned,
+                    f"Work earnings: {amount} {currency_name}",
+                    current_time,
+                    audit=log_embed,
+                    idempotency_key=f"work:{interaction.id}"
+                )
+                if not worked:
+                    remaining = max(result - int(current_time.timestamp()), 1)
+        if remaining:
+            embed = Embed(
+                title=f"{bank.time_emoji} Work Cooldown",
+                description=f"You need to rest for **{remaining // 3600}** hours and **{remaining % 3600 // 60}** minutes before working again!",
+                color=bank.error_color
+            )
+            if (user_id, 'work') not in bank.reminders.opted_in:
+                embed.set_footer(text="Tip: /remind_me sends you a DM when you can work again")
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
         
-        current_balance = bank.get_balance(user_id)
+        current_balance = result
         work_quote = random.choice(bank.work_quotes)
         
         embed = Embed(
@@ -704,27 +2569,7 @@ async def work(interaction: discord.Interaction):
             value=bank.format_currency(current_balance),
             inline=False
         )
-        embed.set_footer(text=f"Come back in 4 hours to work again!")
-        
-        bank.log_transaction(
-            user_id, 
-            knuts_earned, 
-            'work',  # Changed from 'income' to be more specific
-            str(interaction.user.id),
-            f"Work earnings: {amount} {currency_name}"
-        )
-        
-        # After successful work, create and send log
-        log_embed = Embed(
-            title="Work Activity Log",
-            description=f"{interaction.user.mention} worked and earned {bank.format_currency(knuts_earned)}",
-            color=bank.info_color,
-            timestamp=datetime.now()
-        )
-        log_embed.set_footer(text=f"User ID: {interaction.user.id}")
-        
-        # Send to log channel
-        await bank.log_to_channel(bot, log_embed)
+        embed.set_footer(text=f"Come back in {bank.cooldowns.durations['work'] // 3600} hours to work again!")
         
         # Send original response to user
         await interaction.response.send_message(embed=embed)
@@ -743,76 +2588,21 @@ async def collect_income(interaction: discord.Interaction):
         username = interaction.user.display_name
         current_time = datetime.now()
         
-        # Check cooldown
-        last_income = bank.get_cooldown(user_id, 'income_cooldown')
-        if last_income:
-            last_income = datetime.fromisoformat(last_income)
-            if current_time < last_income + timedelta(weeks=1):
-                days_remaining = ((last_income + timedelta(weeks=1) - current_time).days)
-                hours_remaining = ((last_income + timedelta(weeks=1) - current_time).seconds // 3600)
-                
-                embed = Embed(
-                    title=f"{bank.time_emoji} Income Cooldown",
-                    description=f"You must wait **{days_remaining}** days and **{hours_remaining}** hours before collecting again!",
-                    color=bank.error_color
-                )
-                await interaction.response.send_message(embed=embed)
-                return
-        
-        # Find highest paying role
-        highest_income = None
-        highest_role = None
-        highest_config = None
-        
-        for role in interaction.user.roles:
-            role_id_str = str(role.id)
-            if role_id_str in bank.config['income_roles']:
-                current_role = bank.config['income_roles'][role_id_str]
-                current_knuts = current_role['amount']
-                
-                if current_role['currency'] == 'galleon':
-                    current_knuts *= bank.KNUTS_PER_GALLEON
-                elif current_role['currency'] == 'sickle':
-                    current_knuts *= bank.KNUTS_PER_SICKLE
-                    
-                if highest_income is None or current_knuts > highest_income:
-                    highest_income = current_knuts
-                    highest_role = role
-                    highest_config = current_role
-        
-        # If no role-based income, use default
-        if highest_income is None:
-            default_config = bank.config['default_income']
-            highest_income = default_config['amount']
-            if default_config['currency'] == 'galleon':
-                highest_income *= bank.KNUTS_PER_GALLEON
-            elif default_config['currency'] == 'sickle':
-                highest_income *= bank.KNUTS_PER_SICKLE
-            highest_config = default_config
-        
-        # Update balance and set cooldown
-        bank.update_balance(user_id, highest_income, username)
-        bank.set_cooldown(user_id, 'income_cooldown', current_time.isoformat())
-        
-        # Log transaction with specific type
-        bank.log_transaction(
-            user_id, 
-            highest_income, 
-            'income',
-            str(interaction.user.id),
-            f"Weekly income - {'Role: ' + highest_role.name if highest_role else 'Default'}"
-        )
-        
-        # Get new balance
-        new_balance = bank.get_balance(user_id)
+        # Highest paying role (falls back to default_income), from the tier cache
+        tier = bank.members.get(interaction.user)
+        role_id, highest_config, highest_income = tier.income_role_id, tier.income_config, tier.income_knuts
+        highest_role = interaction.user.get_role(role_id) if role_id else None
         
-        embed = Embed(
-            title=f"{bank.bank_emoji} Weekly Income Collected!",
-            color=bank.success_color
+        # Log embed goes to the audit outbox in the same transaction as the payment
+        log_embed = Embed(
+            title="💰 Income Collected",
+            description=f"{interaction.user.mention} collected their weekly income",
+            color=bank.info_color,
+            timestamp=datetime.now()
         )
         
         if highest_role:
-            embed.add_field(
+            log_embed.add_field(
                 name="Role Income",
                 value=f"Role: {highest_role.mention}\n"
                       f"Amount: **{highest_config['amount']}** {highest_config['currency'].title()}s\n"
@@ -820,30 +2610,54 @@ async def collect_income(interaction: discord.Interaction):
                 inline=False
             )
         else:
-            embed.add_field(
+            log_embed.add_field(
                 name="Basic Income",
                 value=f"Amount: **{highest_config['amount']}** {highest_config['currency'].title()}s\n"
                       f"({bank.format_currency(highest_income)})",
                 inline=False
             )
         
-        embed.add_field(
-            name="New Balance",
-            value=bank.format_currency(new_balance),
-            inline=False
-        )
-        embed.set_footer(text="Come back next week to collect again!")
+        log_embed.set_footer(text=f"User ID: {interaction.user.id}")
+        
+        # Cooldown check from memory, then credit, conditional cooldown stamp and ledger
+        # entry in one transaction (queued behind any other money-moving command from this user)
+        async with bank.user_locks.hold(user_id):
+            remaining = await bank.acooldown_remaining(user_id, 'income')
+            if not remaining:
+                collected, result = await bank.aperform_income_collection(
+                    user_id,
+                    username,
+                    highest_income,
+                    f"Weekly income - {'Role: ' + highest_role.name if highest_role else 'Default'}",
+                    current_time,
+                    audit=log_embed,
+                    idempotency_key=f"income:{interaction.id}"
+                )
+                if not collected:
+                    remaining = max(result - int(current_time.timestamp()), 1)
+        if remaining:
+            days_remaining = remaining // 86400
+            hours_remaining = remaining % 86400 // 3600
+            
+            embed = Embed(
+                title=f"{bank.time_emoji} Income Cooldown",
+                description=f"You must wait **{days_remaining}** days and **{hours_remaining}** hours before collecting again!",
+                color=bank.error_color
+            )
+            if (user_id, 'income') not in bank.reminders.opted_in:
+                embed.set_footer(text="Tip: /remind_me sends you a DM when your income is ready")
+            await interaction.response.send_message(embed=embed)
+            return
         
-        # After successful income collection, before sending response, add log
-        log_embed = Embed(
-            title="💰 Income Collected",
-            description=f"{interaction.user.mention} collected their weekly income",
-            color=bank.info_color,
-            timestamp=datetime.now()
+        new_balance = result
+        
+        embed = Embed(
+            title=f"{bank.bank_emoji} Weekly Income Collected!",
+            color=bank.success_color
         )
         
         if highest_role:
-            log_embed.add_field(
+            embed.add_field(
                 name="Role Income",
                 value=f"Role: {highest_role.mention}\n"
                       f"Amount: **{highest_config['amount']}** {highest_config['currency'].title()}s\n"
@@ -851,17 +2665,19 @@ async def collect_income(interaction: discord.Interaction):
                 inline=False
             )
         else:
-            log_embed.add_field(
+            embed.add_field(
                 name="Basic Income",
                 value=f"Amount: **{highest_config['amount']}** {highest_config['currency'].title()}s\n"
                       f"({bank.format_currency(highest_income)})",
                 inline=False
             )
         
-        log_embed.set_footer(text=f"User ID: {interaction.user.id}")
-        
-        # Send to log channel
-        await bank.log_to_channel(bot, log_embed)
+        embed.add_field(
+            name="New Balance",
+            value=bank.format_currency(new_balance),
+            inline=False
+        )
+        embed.set_footer(text="Come back next week to collect again!")
         
         await interaction.response.send_message(embed=embed)
     except Exception as e:
@@ -871,6 +2687,39 @@ async def collect_income(interaction: discord.Interaction):
             ephemeral=True
         )
 
+@bot.tree.command(name="remind_me", description="Get a DM when your work or income cooldown is over")
+@app_commands.describe(
+    cooldown="Which cooldown to be reminded about",
+    enabled="Turn the reminder on or off"
+)
+async def remind_me(interaction: discord.Interaction, cooldown: Literal["work", "income"], enabled: bool = True):
+    user_id = str(interaction.user.id)
+    try:
+        remaining = await bank.aset_reminder(user_id, cooldown, enabled)
+    except Exception as e:
+        print(f"Error in remind_me command: {e}")
+        await interaction.response.send_message(
+            "An error occurred while saving your reminder. Please try again later.",
+            ephemeral=True
+        )
+        return
+    
+    what = "you can work again" if cooldown == "work" else "your weekly income is ready"
+    if not enabled:
+        description = f"You will no longer get a DM when {what}."
+    elif remaining:
+        when = int(time.time()) + remaining
+        description = f"I'll send you a DM when {what} (<t:{when}:R>)."
+    else:
+        description = f"I'll send you a DM when {what}. Your cooldown is already over right now!"
+    
+    embed = Embed(
+        title=f"{bank.time_emoji} Cooldown Reminder {'On' if enabled else 'Off'}",
+        description=description,
+        color=bank.success_color if enabled else bank.info_color
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @bot.tree.command(name="balance", description="Check your balance or another user's balance")
 async def balance(interaction: discord.Interaction, user: Optional[discord.Member] = None):
     # If no user specified, show own balance
@@ -878,11 +2727,7 @@ async def balance(interaction: discord.Interaction, user: Optional[discord.Membe
         user = interaction.user
     # If trying to view someone else's balance, check permissions
     elif user != interaction.user:
-        has_permission = False
-        for role in interaction.user.roles:
-            if role.id in bank.banker_roles:
-                has_permission = True
-                break
+        has_permission = bank.members.get(interaction.user).is_banker
         
         if not has_permission:
             embed = Embed(
@@ -895,9 +2740,9 @@ async def balance(interaction: discord.Interaction, user: Optional[discord.Membe
     
     user_id = str(user.id)
     # Update username in database
-    bank.update_username(user_id, user.display_name)
+    await bank.aupdate_username(user_id, user.display_name)
     
-    balance_knuts = bank.get_balance(user_id)
+    balance_knuts = await bank.aget_balance(user_id)
     galleons, sickles, knuts = bank.convert_to_all_denominations(balance_knuts)
     
     embed = Embed(
@@ -936,11 +2781,7 @@ async def balance(interaction: discord.Interaction, user: Optional[discord.Membe
     currency="Currency type (Galleons, Sickles, or Knuts)"
 )
 async def modify_balance(interaction: discord.Interaction, user: discord.Member, amount: int, currency: Literal["Galleons", "Sickles", "Knuts"]):
-    has_permission = False
-    for role in interaction.user.roles:
-        if role.id in bank.banker_roles:
-            has_permission = True
-            break
+    has_permission = bank.members.get(interaction.user).is_banker
     
     if not has_permission and interaction.user.id != bot.owner_id:
         embed = Embed(
@@ -962,23 +2803,43 @@ async def modify_balance(interaction: discord.Interaction, user: discord.Member,
     else:
         knuts_amount = amount
     
-    # Get old balance for logging
-    old_balance = bank.get_balance(user_id)
-    
-    # Update balance
-    bank.update_balance(user_id, knuts_amount, username)
-    
-    # Log admin modification
-    bank.log_transaction(
-        user_id,
-        knuts_amount,
-        'admin',
-        str(interaction.user.id),
-        f"Admin balance modification: {amount} {currency} by {interaction.user.display_name}"
-    )
+    # The log embed needs the new balance, so it is built inside the write transaction
+    def build_log_embed(new_balance: int) -> Embed:
+        log_embed = Embed(
+            title="Balance Modification Log",
+            description=f"Balance modified by {interaction.user.mention}",
+            color=bank.info_color,
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Target User",
+            value=f"{user.mention} ({user.id})",
+            inline=False
+        )
+        log_embed.add_field(
+            name="Modification",
+            value=f"Amount: {bank.format_currency(knuts_amount)}",
+            inline=False
+        )
+        log_embed.add_field(
+            name="New Balance",
+            value=bank.format_currency(new_balance),
+            inline=False
+        )
+        return log_embed
     
-    # Get new balance
-    new_balance = bank.get_balance(user_id)
+    # Update balance, log the admin modification and queue the audit embed in one transaction
+    async with bank.user_locks.hold(user_id):
+        old_balance, new_balance = await bank.aadjust_balance(
+            user_id,
+            username,
+            knuts_amount,
+            'admin',
+            str(interaction.user.id),
+            f"Admin balance modification: {amount} {currency} by {interaction.user.display_name}",
+            audit=build_log_embed,
+            idempotency_key=f"admin:{interaction.id}"
+        )
     
     embed = Embed(
         title="💰 Balance Modified",
@@ -1004,32 +2865,6 @@ async def modify_balance(interaction: discord.Interaction, user: discord.Member,
         inline=False
     )
     
-    # Create log embed
-    log_embed = Embed(
-        title="Balance Modification Log",
-        description=f"Balance modified by {interaction.user.mention}",
-        color=bank.info_color,
-        timestamp=datetime.now()
-    )
-    log_embed.add_field(
-        name="Target User",
-        value=f"{user.mention} ({user.id})",
-        inline=False
-    )
-    log_embed.add_field(
-        name="Modification",
-        value=f"Amount: {bank.format_currency(knuts_amount)}",
-        inline=False
-    )
-    log_embed.add_field(
-        name="New Balance",
-        value=bank.format_currency(new_balance),
-        inline=False
-    )
-    
-    # Send to log channel
-    await bank.log_to_channel(bot, log_embed)
-    
     # Send original response
     await interaction.response.send_message(embed=embed)
 
@@ -1038,24 +2873,20 @@ async def modify_balance(interaction: discord.Interaction, user: discord.Member,
 
 @bot.tree.command(name="shop", description="Browse and buy items from the shop")
 async def shop(interaction: discord.Interaction):
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute('SELECT DISTINCT category FROM shop_items ORDER BY category')
-        categories = c.fetchall()
+    async with bank.responses.track(interaction, 'shop', ephemeral=True) as reply:
+        categories = await bank.aget_shop_categories()
         
         if not categories:
-            await interaction.response.send_message("No items in shop yet!", ephemeral=True)
+            await reply.send("No items in shop yet!", ephemeral=True)
             return
 
         # Create category selection menu
         options = []
-        for cat in categories:
-            c.execute('SELECT COUNT(*) FROM shop_items WHERE category = ?', (cat[0],))
-            count = c.fetchone()[0]
+        for category, count in categories:
             options.append(
                 SelectOption(
-                    label=cat[0],
-                    value=cat[0],
+                    label=category,
+                    value=category,
                     description=f"{count} items available"
                 )
             )
@@ -1074,18 +2905,12 @@ async def shop(interaction: discord.Interaction):
 
             async def callback(self, interaction: discord.Interaction):
                 # Get items for selected category
-                with bank.get_db_connection() as conn:
-                    c = conn.cursor()
-                    c.execute('''SELECT id, name, price, description, required_role 
-                                FROM shop_items 
-                                WHERE category = ?
-                                ORDER BY price''', (self.values[0],))
-                    items = c.fetchall()
+                items = await bank.aget_shop_items(self.values[0])
 
                 # Create item selection menu
                 options = []
                 for item in items:
-                    price_text = bank.format_currency_short(item[2])  # Using new short format
+                    price_text = item[5]  # Pre-formatted short price from the catalog cache
                     options.append(
                         SelectOption(
                             label=f"{item[1]} ({price_text})",  # Include price in label
@@ -1103,46 +2928,39 @@ async def shop(interaction: discord.Interaction):
 
                     async def callback(self, interaction: discord.Interaction):
                         item_id = int(self.values[0])
-                        
+                    
                         # Get item details first
-                        with bank.get_db_connection() as conn:
-                            c = conn.cursor()
-                            c.execute('''SELECT name, price, category, description, required_role 
-                                        FROM shop_items WHERE id = ?''', (item_id,))
-                            item = c.fetchone()
-                            
-                            if not item:
-                                await interaction.response.send_message(
-                                    "This item is no longer available!",
-                                    ephemeral=True
-                                )
-                                return
+                        item = await bank.aget_item_details(item_id)
+                    
+                        if not item:
+                            await interaction.response.send_message(
+                                "This item is no longer available!",
+                                ephemeral=True
+                            )
+                            return
+
+                        name, price, category = item['name'], item['price'], item['category']
+                        description, required_role = item['description'], item['required_role']
+                    
+                        # Check if user can afford the item
+                        user_balance = await bank.aget_balance(str(interaction.user.id))
+                        if user_balance < price:
+                            await interaction.response.send_message(
+                                f"You cannot afford this item! Price: {bank.format_currency(price)}",
+                                ephemeral=True
+                            )
+                            return
 
-                            name, price, category, description, required_role = item
-                            
-                            # Check if user can afford the item
-                            user_balance = bank.get_balance(str(interaction.user.id))
-                            if user_balance < price:
+                        # Check required role if any
+                        if required_role:
+                            has_role = required_role.isdigit() and int(required_role) in bank.members.get(interaction.user).role_ids
+                            if not has_role:
                                 await interaction.response.send_message(
-                                    f"You cannot afford this item! Price: {bank.format_currency(price)}",
+                                    f"You need the <@&{required_role}> role to buy this item!",
                                     ephemeral=True
                                 )
                                 return
 
-                            # Check required role if any
-                            if required_role:
-                                has_role = False
-                                for role in interaction.user.roles:
-                                    if str(role.id) == required_role:
-                                        has_role = True
-                                        break
-                                if not has_role:
-                                    await interaction.response.send_message(
-                                        f"You need the <@&{required_role}> role to buy this item!",
-                                        ephemeral=True
-                                    )
-                                    return
-
                         # Create confirmation buttons
                         class ConfirmPurchase(View):
                             def __init__(self):
@@ -1151,15 +2969,40 @@ async def shop(interaction: discord.Interaction):
                             @discord.ui.button(label="Confirm Purchase", style=discord.ButtonStyle.green)
                             async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
                                 try:
-                                    # Process the purchase
-                                    success = bank.process_purchase(
-                                        str(interaction.user.id),
-                                        item_id,
-                                        category,
-                                        price,
-                                        name,
-                                        description
+                                    # Purchase log, written to the audit outbox with the purchase
+                                    log_embed = Embed(
+                                        title="🛒 Item Purchased",
+                                        description=f"{interaction.user.mention} bought **{name}**",
+                                        color=bank.info_color,
+                                        timestamp=datetime.now()
+                                    )
+                                    log_embed.add_field(
+                                        name="Item Details",
+                                        value=f"Category: {category}\nPrice: {bank.format_currency(price)}",
+                                        inline=False
                                     )
+                                    log_embed.set_footer(text=f"User ID: {interaction.user.id}")
+                                
+                                    # Process the purchase; a second click while the first is
+                                    # still running is turned away instead of racing it, and one
+                                    # confirmation message can only ever buy the item once
+                                    async with bank.user_locks.hold(str(interaction.user.id), wait=False) as acquired:
+                                        if not acquired:
+                                            await interaction.response.send_message(
+                                                "Another transaction on your account is in progress, please try again!",
+                                                ephemeral=True
+                                            )
+                                            return
+                                        success = await bank.aprocess_purchase(
+                                            str(interaction.user.id),
+                                            item_id,
+                                            category,
+                                            price,
+                                            name,
+                                            description,
+                                            audit=log_embed,
+                                            idempotency_key=f"purchase:{interaction.message.id}"
+                                        )
 
                                     if success:
                                             # Create success embed
@@ -1168,7 +3011,7 @@ async def shop(interaction: discord.Interaction):
                                                 description=f"You bought {name} for {bank.format_currency_short(price)}!",
                                                 color=bank.success_color
                                             )
-                                            
+                                        
                                             if description:
                                                 success_embed.add_field(
                                                     name="Item Description",
@@ -1247,7 +3090,7 @@ async def shop(interaction: discord.Interaction):
                 # Update view with item selection
                 view = View()
                 view.add_item(ItemSelect())
-                
+            
                 # Create embed for items list
                 embed = Embed(
                     title=f"🛍️ Shop - {self.values[0]}",
@@ -1258,15 +3101,15 @@ async def shop(interaction: discord.Interaction):
                 # Add items list to embed
                 items_text = []
                 for item in items:
-                    price_text = bank.format_currency_short(item[2])
+                    price_text = item[5]
                     items_text.append(f"**{item[1]}** - {price_text}")
                     if item[3]:  # If there's a description
                         items_text.append(f"*{item[3]}*")
                     items_text.append("")  # Add blank line between items
-                
+            
                 if items_text:
                     embed.description = "Select an item to purchase:\n\n" + "\n".join(items_text)
-                
+            
                 await interaction.response.edit_message(embed=embed, view=view)
 
         # Send initial category selection
@@ -1275,8 +3118,8 @@ async def shop(interaction: discord.Interaction):
             description="Select a category to browse:",
             color=bank.info_color
         )
-        
-        await interaction.response.send_message(
+    
+        await reply.send(
             embed=embed,
             view=ShopView(),
             ephemeral=True
@@ -1303,11 +3146,7 @@ async def add_item(interaction: discord.Interaction,
         return
 
     # Check if user has shop manager role
-    has_permission = False
-    for role in interaction.user.roles:
-        if role.id in bank.config['shop_manager_roles']:
-            has_permission = True
-            break
+    has_permission = bank.members.get(interaction.user).is_shop_manager
     
     if not has_permission and interaction.user.id != bot.owner_id:
         await interaction.response.send_message(
@@ -1325,14 +3164,8 @@ async def add_item(interaction: discord.Interaction,
         price_in_knuts = price
     
     # Add item directly
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute('''INSERT INTO shop_items 
-                    (name, price, category, description, required_role, added_by)
-                    VALUES (?, ?, ?, ?, ?, ?)''',
-                 (name, price_in_knuts, category, description, 
-                  required_role, str(interaction.user.id)))
-        conn.commit()
+    await bank.aadd_shop_item(name, price_in_knuts, category, description,
+                              str(interaction.user.id), required_role=required_role)
     
     embed = Embed(
         title="✨ New Item Added",
@@ -1380,25 +3213,15 @@ async def add_item(interaction: discord.Interaction,
     log_embed.set_footer(text=f"Added by: {interaction.user.id}")
     
     # Send to log channel
-    await bank.log_to_channel(bot, log_embed)
+    bank.log_to_channel(bot, log_embed)
 
 @add_item.autocomplete('category')
 async def category_autocomplete(interaction: discord.Interaction, current: str):
-    # Get existing categories from database, excluding default ones
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute('''
-            SELECT DISTINCT category 
-            FROM shop_items 
-            WHERE category NOT IN ('Wands', 'Brooms', 'Accessories')
-        ''')
-        categories = [row[0] for row in c.fetchall()]
-    
-    # Filter categories based on what user has typed
+    # Match existing categories (excluding default ones) from the autocomplete index
     filtered = [
-        app_commands.Choice(name=cat, value=cat)
-        for cat in categories
-        if current.lower() in cat.lower()
+        app_commands.Choice(name=label, value=value)
+        for label, value in bank.catalog.complete_categories(current, interaction.user.id,
+                                                             exclude_defaults=True)
     ]
     
     # If no matches and user is typing a new category
@@ -1414,178 +3237,116 @@ async def profile(interaction: discord.Interaction, user: Optional[discord.Membe
     user_id = str(target_user.id)
     
     # Get user's house role
-    house_roles = {
-        bank.config['house_roles']['gryffindor']: ("Gryffindor", 0xAE0001),
-        bank.config['house_roles']['slytherin']: ("Slytherin", 0x2A623D),
-        bank.config['house_roles']['ravenclaw']: ("Ravenclaw", 0x222F5B),
-        bank.config['house_roles']['hufflepuff']: ("Hufflepuff", 0xFDB347)
+    house_colors = {
+        'gryffindor': 0xAE0001,
+        'slytherin': 0x2A623D,
+        'ravenclaw': 0x222F5B,
+        'hufflepuff': 0xFDB347
     }
     
     user_house = "Unsorted"
     house_color = 0x808080  # Default gray
     house_emoji = "🏰"  # Default castle emoji for unsorted users
     
-    for role in target_user.roles:
-        if role.id in house_roles:
-            user_house, house_color = house_roles[role.id]
-            house_emoji = bank.house_emoji[user_house.lower()]
-            break
+    house = bank.members.get(target_user).house
+    if house:
+        user_house, house_color = house.title(), house_colors[house]
+        house_emoji = bank.house_emoji[house]
     
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        
-        # Get wand info
-        c.execute('''
-            SELECT COALESCE(s.name, r.name) as name, 
-                   COALESCE(s.properties, r.properties) as properties
-            FROM inventory i
-            LEFT JOIN shop_items s ON i.item_id = s.id AND i.is_removed_item = 0
-            LEFT JOIN removed_shop_items r ON i.item_id = r.id AND i.is_removed_item = 1
-            WHERE i.user_id = ? AND COALESCE(s.category, r.category) = 'Wands'
-        ''', (user_id,))
-        wand = c.fetchone()
-        
-        # Get accessories (separate query)
-        c.execute('''
-            SELECT COALESCE(s.name, r.name) as name, 
-                   COALESCE(s.properties, r.properties) as properties,
-                   COALESCE(s.description, r.description) as description
-            FROM inventory i
-            LEFT JOIN shop_items s ON i.item_id = s.id AND i.is_removed_item = 0
-            LEFT JOIN removed_shop_items r ON i.item_id = r.id AND i.is_removed_item = 1
-            WHERE i.user_id = ? AND COALESCE(s.category, r.category) = 'Accessories'
-            ORDER BY name
-        ''', (user_id,))
-        accessories = c.fetchall()
-        
-        # Get broom info
-        c.execute('''
-            SELECT COALESCE(s.name, r.name) as name, 
-                   COALESCE(s.properties, r.properties) as properties
-            FROM inventory i
-            LEFT JOIN shop_items s ON i.item_id = s.id AND i.is_removed_item = 0
-            LEFT JOIN removed_shop_items r ON i.item_id = r.id AND i.is_removed_item = 1
-            WHERE i.user_id = ? AND COALESCE(s.category, r.category) = 'Brooms'
-        ''', (user_id,))
-        broom = c.fetchone()
-        
-        # Get other inventory items
-        c.execute('''
-            SELECT COALESCE(s.name, r.name) as name,
-                   COALESCE(s.description, r.description) as description,
-                   COALESCE(s.category, r.category) as category
-            FROM inventory i
-            LEFT JOIN shop_items s ON i.item_id = s.id AND i.is_removed_item = 0
-            LEFT JOIN removed_shop_items r ON i.item_id = r.id AND i.is_removed_item = 1
-            WHERE i.user_id = ? 
-            AND COALESCE(s.category, r.category) NOT IN ('Wands', 'Brooms', 'Accessories')
-            ORDER BY category, name
-        ''', (user_id,))
-        inventory_items = c.fetchall()
-    
-    embed = Embed(
-        title=f"{target_user.display_name}'s Profile",
-        color=house_color
-    )
+    async with bank.responses.track(interaction, 'profile') as reply:
+        wand, accessories, broom, inventory_items = await bank.aget_profile_items(user_id)
     
-    # Add user info
-    embed.set_thumbnail(url=target_user.display_avatar.url)
-    embed.add_field(
-        name="House",
-        value=f"{house_emoji} {user_house}",
-        inline=True
-    )
+        embed = Embed(
+            title=f"{target_user.display_name}'s Profile",
+            color=house_color
+        )
     
-    # Add wand info if they have one
-    if wand:
-        name, properties = wand
-        if properties:
-            wand_props = json.loads(properties)
-            embed.add_field(
-                name="Wand",
-                value=f"{wand_props['length']} inches, {wand_props['wood']}\n"
-                      f"{wand_props['core']} core, {wand_props['flexibility']}",
-                inline=False
-            )
+        # Add user info
+        embed.set_thumbnail(url=target_user.display_avatar.url)
+        embed.add_field(
+            name="House",
+            value=f"{house_emoji} {user_house}",
+            inline=True
+        )
     
-    # Add accessories if they have any
-    if accessories:
-        accessories_dict = {}  # To group duplicate accessories
-        for name, properties, description in accessories:
+        # Add wand info if they have one
+        if wand:
+            name, properties = wand
             if properties:
-                props = json.loads(properties)
-                key = f"{name}|{properties}"  # Use name and properties as unique key
-                
-                if key in accessories_dict:
-                    accessories_dict[key]['count'] += 1
-                else:
-                    accessories_dict[key] = {
-                        'name': name,
-                        'props': props,
-                        'description': description,
-                        'count': 1
-                    }
-        
-        if accessories_dict:
-            accessories_text = []
-            for acc_data in accessories_dict.values():
-                acc_text = f"**{acc_data['name']}"
-                if acc_data['count'] > 1:
-                    acc_text += f" (x{acc_data['count']})"
-                acc_text += "**\n"
-                acc_text += f"Material: {acc_data['props']['material']}\n" \
-                           f"Type: {acc_data['props']['type']}\n" \
-                           f"Enchantment: {acc_data['props']['enchantment']}"
-                if acc_data['description']:
-                    acc_text += f"\n{acc_data['description']}"
-                accessories_text.append(acc_text)
-            
-            embed.add_field(
-                name="Accessories",
-                value="\n\n".join(accessories_text),
-                inline=False
-            )
+                wand_props = json.loads(properties)
+                embed.add_field(
+                    name="Wand",
+                    value=f"{wand_props['length']} inches, {wand_props['wood']}\n"
+                          f"{wand_props['core']} core, {wand_props['flexibility']}",
+                    inline=False
+                )
     
-    # Add broom info if they have one
-    if broom:
-        name, properties = broom
-        if properties:
-            broom_props = json.loads(properties)
-            embed.add_field(
-                name="Broom",
-                value=f"{broom_props['length']} inches, {broom_props['wood']} handle\n"
-                      f"{broom_props['bristle']}, {broom_props['speed']} speed",
-                inline=False
-            )
+        # Add accessories if they have any
+        if accessories:
+            accessories_text = []  # Duplicates are already stacked with a quantity
+            for name, properties, description, quantity in accessories:
+                if properties:
+                    props = json.loads(properties)
+                    acc_text = f"**{name}"
+                    if quantity > 1:
+                        acc_text += f" (x{quantity})"
+                    acc_text += "**\n"
+                    acc_text += f"Material: {props['material']}\n" \
+                               f"Type: {props['type']}\n" \
+                               f"Enchantment: {props['enchantment']}"
+                    if description:
+                        acc_text += f"\n{description}"
+                    accessories_text.append(acc_text)
+        
+            if accessories_text:
+                embed.add_field(
+                    name="Accessories",
+                    value="\n\n".join(accessories_text),
+                    inline=False
+                )
     
-    # Add other inventory items
-    if inventory_items:
-        current_category = None
-        category_items = []
-        
-        for name, description, category in inventory_items:
-            if category != current_category:
-                if category_items:
-                    embed.add_field(
-                        name=current_category,
-                        value="\n".join(category_items),
-                        inline=False
-                    )
-                current_category = category
-                category_items = []
-            item_text = f"• {name}"
-            if description:
-                item_text += f" - {description}"
-            category_items.append(item_text)
-        
-        if category_items:
-            embed.add_field(
-                name=current_category,
-                value="\n".join(category_items),
-                inline=False
-            )
+        # Add broom info if they have one
+        if broom:
+            name, properties = broom
+            if properties:
+                broom_props = json.loads(properties)
+                embed.add_field(
+                    name="Broom",
+                    value=f"{broom_props['length']} inches, {broom_props['wood']} handle\n"
+                          f"{broom_props['bristle']}, {broom_props['speed']} speed",
+                    inline=False
+                )
     
-    await interaction.response.send_message(embed=embed)
+        # Add other inventory items
+        if inventory_items:
+            current_category = None
+            category_items = []
+        
+            for name, description, category, quantity in inventory_items:
+                if category != current_category:
+                    if category_items:
+                        embed.add_field(
+                            name=current_category,
+                            value="\n".join(category_items),
+                            inline=False
+                        )
+                    current_category = category
+                    category_items = []
+                item_text = f"• {name}"
+                if quantity > 1:
+                    item_text += f" (x{quantity})"
+                if description:
+                    item_text += f" - {description}"
+                category_items.append(item_text)
+        
+            if category_items:
+                embed.add_field(
+                    name=current_category,
+                    value="\n".join(category_items),
+                    inline=False
+                )
+    
+        await reply.send(embed=embed)
 
 @bot.tree.command(name="create_wand", description="Add a wand to the shop (Shop Managers only)")
 @app_commands.describe(
@@ -1612,11 +3373,7 @@ async def create_wand(
     required_role: Optional[str] = None
 ):
     # Check if user has shop manager role
-    has_permission = False
-    for role in interaction.user.roles:
-        if role.id in bank.config['shop_manager_roles']:
-            has_permission = True
-            break
+    has_permission = bank.members.get(interaction.user).is_shop_manager
     
     if not has_permission and interaction.user.id != bot.owner_id:
         await interaction.response.send_message(
@@ -1642,19 +3399,13 @@ async def create_wand(
         "power": power
     }
     
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute('''INSERT INTO shop_items 
-                    (name, price, category, description, added_by, properties, required_role)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                 (name, 
-                  price_in_knuts, 
-                  "Wands",
-                  f"{length} inches, {wood} with {core} core, {flexibility}, {power} power",
-                  str(interaction.user.id),
-                  json.dumps(properties),
-                  required_role))
-        conn.commit()
+    await bank.aadd_shop_item(name,
+                              price_in_knuts,
+                              "Wands",
+                              f"{length} inches, {wood} with {core} core, {flexibility}, {power} power",
+                              str(interaction.user.id),
+                              properties,
+                              required_role)
     
     embed = Embed(
         title="✨ New Wand Added",
@@ -1701,15 +3452,14 @@ async def create_wand(
     )
     log_embed.set_footer(text=f"Created by: {interaction.user.id}")
     
-    # Send to log channel
-    await bank.log_to_channel(bot, log_embed)
-
-    # Update the log embed to include required role
     log_embed.add_field(
         name="Required Role",
         value=f"<@&{required_role}>" if required_role else "None",
         inline=False
     )
+    
+    # Send to log channel
+    bank.log_to_channel(bot, log_embed)
 
 @bot.tree.command(name="create_broom", description="Add a broom to the shop (Shop Managers only)")
 @app_commands.describe(
@@ -1734,11 +3484,7 @@ async def create_broom(
     required_role: Optional[str] = None
 ):
     # Check if user has shop manager role
-    has_permission = False
-    for role in interaction.user.roles:
-        if role.id in bank.config['shop_manager_roles']:
-            has_permission = True
-            break
+    has_permission = bank.members.get(interaction.user).is_shop_manager
     
     if not has_permission and interaction.user.id != bot.owner_id:
         await interaction.response.send_message(
@@ -1763,19 +3509,13 @@ async def create_broom(
         "speed": speed
     }
     
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute('''INSERT INTO shop_items 
-                    (name, price, category, description, added_by, properties, required_role)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                 (name, 
-                  price_in_knuts, 
-                  "Brooms",
-                  f"{length} inches, {wood} handle with {bristle}, {speed} speed",
-                  str(interaction.user.id),
-                  json.dumps(properties),
-                  required_role))
-        conn.commit()
+    await bank.aadd_shop_item(name,
+                              price_in_knuts,
+                              "Brooms",
+                              f"{length} inches, {wood} handle with {bristle}, {speed} speed",
+                              str(interaction.user.id),
+                              properties,
+                              required_role)
     
     embed = Embed(
         title="✨ New Broom Added",
@@ -1820,15 +3560,14 @@ async def create_broom(
     )
     log_embed.set_footer(text=f"Created by: {interaction.user.id}")
     
-    # Send to log channel
-    await bank.log_to_channel(bot, log_embed)
-
-    # Update the log embed to include required role
     log_embed.add_field(
         name="Required Role",
         value=f"<@&{required_role}>" if required_role else "None",
         inline=False
     )
+    
+    # Send to log channel
+    bank.log_to_channel(bot, log_embed)
 
 @bot.tree.command(name="destroy", description="Destroy your wand, broom, or accessories")
 @app_commands.describe(
@@ -1845,24 +3584,7 @@ async def destroy(
    
     
     # Get item details with modified query for accessories
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        
-        # Get the specific items we want, checking both active and removed items
-        c.execute('''
-            SELECT 
-                COALESCE(s.name, r.name) as name,
-                COALESCE(s.properties, r.properties) as properties,
-                i.id,
-                COALESCE(s.category, r.category) as category
-            FROM inventory i
-            LEFT JOIN shop_items s ON i.item_id = s.id AND i.is_removed_item = 0
-            LEFT JOIN removed_shop_items r ON i.item_id = r.id AND i.is_removed_item = 1
-            WHERE i.user_id = ? 
-            AND LOWER(COALESCE(s.category, r.category)) = LOWER(?)
-        ''', (user_id, category))
-        
-        items = c.fetchall()
+    items = await bank.aget_inventory_by_category(user_id, category)
     
     if not items:
         await interaction.response.send_message(
@@ -1873,7 +3595,7 @@ async def destroy(
 
     # If it's a wand or broom (single item), proceed directly to confirmation
     if item_type in ["Wand", "Broom"]:
-        name, properties, inventory_id, _ = items[0]
+        name, properties, inventory_id, _, _ = items[0]
         
         # Create confirmation embed
         if properties:
@@ -1904,10 +3626,7 @@ async def destroy(
             
             @discord.ui.button(label="Destroy", style=discord.ButtonStyle.danger)
             async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-                with bank.get_db_connection() as conn:
-                    c = conn.cursor()
-                    c.execute('DELETE FROM inventory WHERE id = ?', (self.inventory_id,))
-                    conn.commit()
+                await bank.aremove_from_inventory(self.inventory_id)
                 
                 result_embed = Embed(
                     title=f"💥 {item_type} Destroyed",
@@ -1936,12 +3655,14 @@ async def destroy(
         class AccessorySelect(Select):
             def __init__(self, items):
                 options = []
-                for name, properties, inventory_id, _ in items:
+                for name, properties, inventory_id, _, quantity in items:
                     description = ""
                     if properties:
                         props = json.loads(properties)
                         description = f"{props['material']} {props['type']}, {props['enchantment']}"
                     
+                    if quantity > 1:
+                        name = f"{name} (x{quantity})"
                     options.append(
                         SelectOption(
                             label=name[:100],  # Ensure label fits Discord limit
@@ -1960,7 +3681,7 @@ async def destroy(
             async def callback(self, interaction: discord.Interaction):
                 selected_id = int(self.values[0])
                 selected_item = next(item for item in items if item[2] == selected_id)
-                name, properties, inventory_id, _ = selected_item
+                name, properties, inventory_id, _, _ = selected_item
                 
                 # Create confirmation embed
                 if properties:
@@ -1987,10 +3708,7 @@ async def destroy(
                     
                     @discord.ui.button(label="Destroy", style=discord.ButtonStyle.danger)
                     async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-                        with bank.get_db_connection() as conn:
-                            c = conn.cursor()
-                            c.execute('DELETE FROM inventory WHERE id = ?', (self.inventory_id,))
-                            conn.commit()
+                        await bank.aremove_from_inventory(self.inventory_id)
                         
                         result_embed = Embed(
                             title="💥 Accessory Destroyed",
@@ -2031,13 +3749,13 @@ async def destroy(
 
 
 @bot.tree.command(name="remove_item", description="Remove an item from the shop (Shop Managers only)")
-async def remove_item(interaction: discord.Interaction, category: str):
+@app_commands.describe(
+    category="Category of the item",
+    item="Item to remove (leave empty to pick from a list)"
+)
+async def remove_item(interaction: discord.Interaction, category: str, item: Optional[str] = None):
     # Check if user has shop manager role
-    has_permission = False
-    for role in interaction.user.roles:
-        if role.id in bank.config['shop_manager_roles']:
-            has_permission = True
-            break
+    has_permission = bank.members.get(interaction.user).is_shop_manager
     
     if not has_permission and interaction.user.id != bot.owner_id:
         await interaction.response.send_message(
@@ -2046,213 +3764,199 @@ async def remove_item(interaction: discord.Interaction, category: str):
         )
         return
     
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
+    async with bank.responses.track(interaction, 'remove_item', ephemeral=True) as reply:
         # Get items from shop
-        c.execute('''SELECT id, name, price, description 
-                    FROM shop_items 
-                    WHERE category = ?
-                    ORDER BY name''', (category,))
-        items = c.fetchall()
+        items = await bank.aget_shop_items(category, order_by='name')
     
-    if not items:
-        await interaction.response.send_message(
-            f"No items found in category '{category}'!",
-            ephemeral=True
-        )
-        return
+        if not items:
+            await reply.send(
+                f"No items found in category '{category}'!",
+                ephemeral=True
+            )
+            return
     
-    # Create item selection menu
-    class ItemSelect(Select):
-        def __init__(self, items):
-            options = []
-            for item_id, name, price, description in items:
-                # Create shorter price description
-                galleons = price // bank.KNUTS_PER_GALLEON
-                remaining = price % bank.KNUTS_PER_GALLEON
-                sickles = remaining // bank.KNUTS_PER_SICKLE
-                knuts = remaining % bank.KNUTS_PER_SICKLE
-                
-                price_text = []
-                if galleons > 0:
-                    price_text.append(f"{galleons}G")
-                if sickles > 0:
-                    price_text.append(f"{sickles}S")
-                if knuts > 0:
-                    price_text.append(f"{knuts}K")
-                price_desc = " ".join(price_text) or "0K"
-                
-                options.append(
-                    SelectOption(
-                        label=name,
-                        value=str(item_id),
-                        description=price_desc
-                    )
-                )
+        async def confirm_removal(interaction: discord.Interaction, item_id: int, from_select: bool):
+            # A select menu pick answers its own interaction; otherwise this is the command's reply
+            send = interaction.response.send_message if from_select else reply.send
             
-            super().__init__(
-                placeholder="Choose an item to remove from shop",
-                options=options
-            )
+            # Get item details
+            item = await bank.aget_item_details(item_id)
         
-        async def callback(self, interaction: discord.Interaction):
-            with bank.get_db_connection() as conn:
-                c = conn.cursor()
-                # Get item details
-                c.execute('''SELECT id, name, price, description 
-                            FROM shop_items 
-                            WHERE id = ?''', (int(self.values[0]),))
-                item = c.fetchone()
-                
-                if not item:
-                    await interaction.response.send_message(
-                        "Item not found! It may have been already removed.",
-                        ephemeral=True
-                    )
-                    return
-                
-                item_id, name, price, description = item
-                
-                # Check how many players own this item
-                c.execute('SELECT COUNT(*) FROM inventory WHERE item_id = ?', (item_id,))
-                owned_count = c.fetchone()[0]
-                
-                # Create confirmation embed
-                embed = Embed(
-                    title="❌ Remove from Shop?",
-                    description=f"Are you sure you want to remove **{name}** from the shop?\n\n"
-                               f"**Category:** {category}\n"
-                               f"**Price:** {bank.format_currency(price)}\n"
-                               f"**Description:** {description or 'None'}\n"
-                               f"**Currently owned by:** {owned_count} users\n\n"
-                               "Note: Players who own this item will keep it in their inventory.",
-                    color=bank.error_color
+            if not item or item['category'] != category:
+                await send(
+                    "Item not found! It may have been already removed.",
+                    ephemeral=True
                 )
-                
-                # Create confirmation buttons
-                class ConfirmButtons(View):
-                    def __init__(self):
-                        super().__init__(timeout=60)
-                    
-                    @discord.ui.button(label="Remove", style=discord.ButtonStyle.danger)
-                    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-                        try:
-                            with bank.get_db_connection() as conn:
-                                c = conn.cursor()
-                                try:
-                                    # First get all item details
-                                    c.execute('''SELECT * FROM shop_items WHERE id = ?''', (item_id,))
-                                    item_data = c.fetchone()
-                                    
-                                    if not item_data:
-                                        await interaction.response.edit_message(
-                                            content="Item not found! It may have been already removed.",
-                                            view=None
-                                        )
-                                        return
-
-                                    # Move item to removed_shop_items
-                                    c.execute('''INSERT INTO removed_shop_items 
-                                               (id, name, price, category, description, properties, added_by)
-                                               VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                                            (item_data['id'], item_data['name'], item_data['price'],
-                                             item_data['category'], item_data['description'],
-                                             item_data['properties'], item_data['added_by']))
-
-                                    # Update inventory records to mark them as removed
-                                    c.execute('''UPDATE inventory 
-                                               SET is_removed_item = 1 
-                                               WHERE item_id = ?''', (item_id,))
-
-                                    # Now delete from shop_items
-                                    c.execute('DELETE FROM shop_items WHERE id = ?', (item_id,))
-
-                                    # Create log embed
-                                    log_embed = Embed(
-                                        title="🗑️ Shop Item Removed",
-                                        description=f"**{name}** was removed from the shop by {interaction.user.mention}",
-                                        color=bank.info_color,
-                                        timestamp=datetime.now()
-                                    )
-                                    log_embed.add_field(
-                                        name="Item Details",
-                                        value=f"Category: {category}\nPrice: {bank.format_currency(price)}",
-                                        inline=False
-                                    )
-                                    log_embed.add_field(
-                                        name="Current Owners",
-                                        value=f"{owned_count} players keep their items",
-                                        inline=False
-                                    )
-                                    log_embed.set_footer(text=f"Removed by: {interaction.user.id}")
-                                    
-                                    # Send to log channel
-                                    await bank.log_to_channel(bot, log_embed)
-                                    
-                                    result_embed = Embed(
-                                        title="✅ Item Removed from Shop",
-                                        description=f"**{name}** has been removed from the shop.\n"
-                                                   f"All {owned_count} current owners keep their items.",
-                                        color=bank.success_color
-                                    )
-                                    await interaction.response.edit_message(
-                                        embed=result_embed,
-                                        view=None
-                                    )
-                                    
-                                except Exception as e:
-                                    print(f"Error removing item: {e}")
-                                    await interaction.response.edit_message(
-                                        content="An error occurred while removing the item.",
-                                        view=None
-                                    )
-                        except Exception as e:
-                            print(f"Error removing item: {e}")
+                return
+        
+            item_id, name, price, description = item['id'], item['name'], item['price'], item['description']
+        
+            # Check how many players own this item
+            owned_count = await bank.aget_item_owner_count(item_id)
+        
+            # Create confirmation embed
+            embed = Embed(
+                title="❌ Remove from Shop?",
+                description=f"Are you sure you want to remove **{name}** from the shop?\n\n"
+                           f"**Category:** {category}\n"
+                           f"**Price:** {bank.format_currency(price)}\n"
+                           f"**Description:** {description or 'None'}\n"
+                           f"**Currently owned by:** {owned_count} users\n\n"
+                           "Note: Players who own this item will keep it in their inventory.",
+                color=bank.error_color
+            )
+        
+            # Create confirmation buttons
+            class ConfirmButtons(View):
+                def __init__(self):
+                    super().__init__(timeout=60)
+            
+                @discord.ui.button(label="Remove", style=discord.ButtonStyle.danger)
+                async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
+                    try:
+                        # Create log embed (queued in the audit outbox with the removal)
+                        log_embed = Embed(
+                            title="🗑️ Shop Item Removed",
+                            description=f"**{name}** was removed from the shop by {interaction.user.mention}",
+                            color=bank.info_color,
+                            timestamp=datetime.now()
+                        )
+                        log_embed.add_field(
+                            name="Item Details",
+                            value=f"Category: {category}\nPrice: {bank.format_currency(price)}",
+                            inline=False
+                        )
+                        log_embed.add_field(
+                            name="Current Owners",
+                            value=f"{owned_count} players keep their items",
+                            inline=False
+                        )
+                        log_embed.set_footer(text=f"Removed by: {interaction.user.id}")
+                    
+                        removed = await bank.aremove_shop_item(item_id, audit=log_embed)
+                    
+                        if not removed:
                             await interaction.response.edit_message(
-                                content="An error occurred while removing the item.",
+                                content="Item not found! It may have been already removed.",
                                 view=None
                             )
-                
-                    @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
-                    async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+                            return
+                    
+                        result_embed = Embed(
+                            title="✅ Item Removed from Shop",
+                            description=f"**{name}** has been removed from the shop.\n"
+                                       f"All {owned_count} current owners keep their items.",
+                            color=bank.success_color
+                        )
                         await interaction.response.edit_message(
-                            content="Item removal cancelled.",
+                            embed=result_embed,
                             view=None
                         )
-                
+                    
+                    except Exception as e:
+                        print(f"Error removing item: {e}")
+                        await interaction.response.edit_message(
+                            content="An error occurred while removing the item.",
+                            view=None
+                        )
+        
+                @discord.ui.button(label="Cancel", style=discord.ButtonStyle.secondary)
+                async def cancel(self, interaction: discord.Interaction, button: discord.ui.Button):
+                    await interaction.response.edit_message(
+                        content="Item removal cancelled.",
+                        view=None
+                    )
+        
+            if from_select:
                 await interaction.response.edit_message(
                     embed=embed,
                     view=ConfirmButtons()
                 )
+            else:
+                await send(
+                    embed=embed,
+                    view=ConfirmButtons(),
+                    ephemeral=True
+                )
+
+        # Item picked through autocomplete (value is the item id) or typed by name
+        if item:
+            if item.isdigit():
+                item_id = int(item)
+            else:
+                item_id = next((row[0] for row in items if row[1].casefold() == item.casefold()), 0)
+            await confirm_removal(interaction, item_id, from_select=False)
+            return
     
-    # Create initial view with item selection
-    view = View()
-    view.add_item(ItemSelect(items))
+        # Create item selection menu
+        class ItemSelect(Select):
+            def __init__(self, items):
+                options = []
+                # Discord allows 25 options; larger categories use the item autocomplete
+                for item_id, name, price, description, _, _ in items[:25]:
+                    # Create shorter price description
+                    galleons = price // bank.KNUTS_PER_GALLEON
+                    remaining = price % bank.KNUTS_PER_GALLEON
+                    sickles = remaining // bank.KNUTS_PER_SICKLE
+                    knuts = remaining % bank.KNUTS_PER_SICKLE
+                
+                    price_text = []
+                    if galleons > 0:
+                        price_text.append(f"{galleons}G")
+                    if sickles > 0:
+                        price_text.append(f"{sickles}S")
+                    if knuts > 0:
+                        price_text.append(f"{knuts}K")
+                    price_desc = " ".join(price_text) or "0K"
+                
+                    options.append(
+                        SelectOption(
+                            label=name,
+                            value=str(item_id),
+                            description=price_desc
+                        )
+                    )
+            
+                super().__init__(
+                    placeholder="Choose an item to remove from shop",
+                    options=options
+                )
+        
+            async def callback(self, interaction: discord.Interaction):
+                await confirm_removal(interaction, int(self.values[0]), from_select=True)
     
-    embed = Embed(
-        title=f"🗑️ Remove Item from {category}",
-        description="Select an item to remove from the shop:",
-        color=bank.info_color
-    )
+        # Create initial view with item selection
+        view = View()
+        view.add_item(ItemSelect(items))
     
-    await interaction.response.send_message(
-        embed=embed,
-        view=view,
-        ephemeral=True
-    )
+        embed = Embed(
+            title=f"🗑️ Remove Item from {category}",
+            description="Select an item to remove from the shop:",
+            color=bank.info_color
+        )
+    
+        await reply.send(
+            embed=embed,
+            view=view,
+            ephemeral=True
+        )
 
 @remove_item.autocomplete('category')
 async def remove_category_autocomplete(interaction: discord.Interaction, current: str):
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute('SELECT DISTINCT category FROM shop_items')
-        categories = [row[0] for row in c.fetchall()]
-    
     return [
-        app_commands.Choice(name=cat, value=cat)
-        for cat in categories
-        if current.lower() in cat.lower()
-    ][:25]
+        app_commands.Choice(name=label, value=value)
+        for label, value in bank.catalog.complete_categories(current, interaction.user.id)
+    ]
+
+@remove_item.autocomplete('item')
+async def remove_item_autocomplete(interaction: discord.Interaction, current: str):
+    category = interaction.namespace.category
+    if not category:
+        return []
+    return [
+        app_commands.Choice(name=label[:100], value=value)
+        for label, value in bank.catalog.complete_items(category, current, interaction.user.id)
+    ]
 
 @bot.tree.command(name="craft_accessories", description="Create a custom accessory (Shop Managers only)")
 @app_commands.describe(
@@ -2277,11 +3981,7 @@ async def craft_accessories(
     required_role: Optional[str] = None
 ):
     # Check if user has shop manager role
-    has_permission = False
-    for role in interaction.user.roles:
-        if role.id in bank.config['shop_manager_roles']:
-            has_permission = True
-            break
+    has_permission = bank.members.get(interaction.user).is_shop_manager
     
     if not has_permission and interaction.user.id != bot.owner_id:
         await interaction.response.send_message(
@@ -2305,104 +4005,96 @@ async def craft_accessories(
         "enchantment": enchantment
     }
     
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        try:
-            c.execute('''INSERT INTO shop_items 
-                        (name, price, category, description, properties, added_by, required_role)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                     (name, 
-                      price_in_knuts, 
-                      "Accessories",
-                      description,
-                      json.dumps(properties),
-                      str(interaction.user.id),
-                      required_role))
-            
-            conn.commit()
-            
-            # Create confirmation embed
-            embed = Embed(
-                title="✨ New Accessory Created",
-                description=f"Added **{name}** to the shop",
-                color=bank.success_color
-            )
-            
-            embed.add_field(
-                name="Price",
-                value=bank.format_currency(price_in_knuts),
-                inline=False
-            )
-            
+    try:
+        await bank.aadd_shop_item(name, 
+                                  price_in_knuts, 
+                                  "Accessories",
+                                  description,
+                                  str(interaction.user.id),
+                                  properties,
+                                  required_role)
+        
+        # Create confirmation embed
+        embed = Embed(
+            title="✨ New Accessory Created",
+            description=f"Added **{name}** to the shop",
+            color=bank.success_color
+        )
+        
+        embed.add_field(
+            name="Price",
+            value=bank.format_currency(price_in_knuts),
+            inline=False
+        )
+        
+        embed.add_field(
+            name="Properties",
+            value=f"Material: {material}\n"
+                  f"Type: {type}\n"
+                  f"Enchantment: {enchantment}",
+            inline=False
+        )
+        
+        if description:
             embed.add_field(
-                name="Properties",
-                value=f"Material: {material}\n"
-                      f"Type: {type}\n"
-                      f"Enchantment: {enchantment}",
-                inline=False
-            )
-            
-            if description:
-                embed.add_field(
-                    name="Description",
-                    value=description,
-                    inline=False
-                )
-            
-            await interaction.response.send_message(embed=embed)
-            
-            # After successful accessory creation, before sending response
-            log_embed = Embed(
-                title="✨ New Accessory Created",
-                description=f"{interaction.user.mention} created a new accessory",
-                color=bank.info_color,
-                timestamp=datetime.now()
-            )
-            log_embed.add_field(
-                name="Accessory Details",
-                value=f"**{name}**\nPrice: {bank.format_currency(price_in_knuts)}",
-                inline=False
-            )
-            log_embed.add_field(
-                name="Properties",
-                value=f"Material: {material}\n"
-                      f"Type: {type}\n"
-                      f"Enchantment: {enchantment}",
+                name="Description",
+                value=description,
                 inline=False
             )
-            if description:
-                log_embed.add_field(
-                    name="Description",
-                    value=description,
-                    inline=False
-                )
-            log_embed.set_footer(text=f"Created by: {interaction.user.id}")
-            
-            # Send to log channel
-            await bank.log_to_channel(bot, log_embed)
-            
-            # Update the log embed to include required role
+        
+        await interaction.response.send_message(embed=embed)
+        
+        # After successful accessory creation, before sending response
+        log_embed = Embed(
+            title="✨ New Accessory Created",
+            description=f"{interaction.user.mention} created a new accessory",
+            color=bank.info_color,
+            timestamp=datetime.now()
+        )
+        log_embed.add_field(
+            name="Accessory Details",
+            value=f"**{name}**\nPrice: {bank.format_currency(price_in_knuts)}",
+            inline=False
+        )
+        log_embed.add_field(
+            name="Properties",
+            value=f"Material: {material}\n"
+                  f"Type: {type}\n"
+                  f"Enchantment: {enchantment}",
+            inline=False
+        )
+        if description:
             log_embed.add_field(
-                name="Required Role",
-                value=f"<@&{required_role}>" if required_role else "None",
+                name="Description",
+                value=description,
                 inline=False
             )
-            
-        except Exception as e:
-            conn.rollback()
-            print(f"Error creating accessory: {e}")
-            await interaction.response.send_message(
-                "An error occurred while creating the accessory.",
-                ephemeral=True
-            )
+        log_embed.set_footer(text=f"Created by: {interaction.user.id}")
+        
+        log_embed.add_field(
+            name="Required Role",
+            value=f"<@&{required_role}>" if required_role else "None",
+            inline=False
+        )
+        
+        # Send to log channel
+        bank.log_to_channel(bot, log_embed)
+        
+    except Exception as e:
+        print(f"Error creating accessory: {e}")
+        await interaction.response.send_message(
+            "An error occurred while creating the accessory.",
+            ephemeral=True
+        )
 @bot.tree.command(name="leaderboard", description="Show various leaderboards")
-async def leaderboard(interaction: discord.Interaction, category: Literal["wealth", "transactions", "income"]):
+@app_commands.describe(
+    category="Which leaderboard",
+    window="Time window for transactions and income (wealth is always current)"
+)
+async def leaderboard(interaction: discord.Interaction, category: Literal["wealth", "transactions", "income"],
+                      window: Literal["all-time", "weekly", "monthly"] = "all-time"):
     # Check if user has banker role
-    has_permission = False
-    for role in interaction.user.roles:
-        if role.id in bank.banker_roles:
-            has_permission = True
-            break
+    has_permission = bank.members.get(interaction.user).is_banker
     
     if not has_permission and interaction.user.id != bot.owner_id:
         await interaction.response.send_message(
@@ -2411,78 +4103,102 @@ async def leaderboard(interaction: discord.Interaction, category: Literal["wealt
         )
         return
 
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        
+    # Wealth is always the current balance, so it has one board for every window
+    if category == "wealth":
+        window = "all-time"
+    
+    async def render():
+        results = await bank.aget_leaderboard(category, window)
+    
         if category == "wealth":
-            c.execute('''
-                SELECT username, (galleons * ? + sickles * ? + knuts) as total
-                FROM users 
-                ORDER BY total DESC LIMIT 10
-            ''', (bank.KNUTS_PER_GALLEON, bank.KNUTS_PER_SICKLE))
             title = "🏆 Wealthiest Users"
-        
         elif category == "transactions":
-            c.execute('''
-                SELECT u.username, COUNT(*) as count
-                FROM transactions t
-                JOIN users u ON t.user_id = u.user_id
-                GROUP BY t.user_id
-                ORDER BY count DESC LIMIT 10
-            ''')
             title = "🔄 Most Active Users"
-        
         else:  # income
-            c.execute('''
-                SELECT u.username, SUM(amount) as total
-                FROM transactions t
-                JOIN users u ON t.user_id = u.user_id
-                WHERE type = 'income'
-                GROUP BY t.user_id
-                ORDER BY total DESC LIMIT 10
-            ''')
             title = "💰 Highest Earners"
-        
-        results = c.fetchall()
+        if category != "wealth" and window != "all-time":
+            title += f" ({'Last 7 Days' if window == 'weekly' else 'Last 30 Days'})"
+
+        embed = Embed(title=title, color=bank.info_color)
+    
+        for i, (_, name, value) in enumerate(results, 1):
+            if category == "transactions":
+                embed.add_field(
+                    name=f"#{i} {name}",
+                    value=f"**{value}** transactions",
+                    inline=False
+                )
+            else:
+                embed.add_field(
+                    name=f"#{i} {name}",
+                    value=bank.format_currency(value),
+                    inline=False
+                )
 
-    embed = Embed(title=title, color=bank.info_color)
+        return results, embed
+
+    async with bank.responses.track(interaction, 'leaderboard') as reply:
+        embed = await bank.leaderboards.get((category, window), render)
+        await reply.send(embed=embed)  # Removed ephemeral=True to make it visible to all
+@bot.tree.command(name="rank", description="See where you stand on a leaderboard")
+@app_commands.describe(
+    category="Which leaderboard",
+    user="Whose rank to show (Bank Masters only)"
+)
+async def rank(interaction: discord.Interaction, category: Literal["wealth", "transactions", "income"],
+               user: Optional[discord.Member] = None):
+    target_user = user or interaction.user
+    is_banker = bank.members.get(interaction.user).is_banker or interaction.user.id == bot.owner_id
+    if target_user != interaction.user and not is_banker:
+        await interaction.response.send_message(
+            "You can only check your own rank!",
+            ephemeral=True
+        )
+        return
+    
+    # Answered from the in-memory rank index, no DB round trip
+    user_id = str(target_user.id)
+    result = bank.ranks.rank(category, user_id)
+    if result is None:
+        await interaction.response.send_message(
+            f"{target_user.display_name} isn't on the {category} leaderboard yet!",
+            ephemeral=True
+        )
+        return
     
-    for i, (name, value) in enumerate(results, 1):
+    def format_value(value):
         if category == "transactions":
-            embed.add_field(
-                name=f"#{i} {name}",
-                value=f"**{value}** transactions",
-                inline=False
-            )
+            return f"**{value}** transactions"
+        return bank.format_currency_short(value)
+    
+    position, total = result['rank'], result['total']
+    top_percent = -(-position * 100 // total)  # rounded up, so #1 of 1000 is the top 1%
+    embed = Embed(
+        title=f"📈 {target_user.display_name}'s {category.title()} Rank",
+        description=f"**#{position}** of {total} (top {top_percent}%)\n{format_value(result['value'])}",
+        color=bank.info_color
+    )
+    
+    # Other members' balances are only shown to Bank Masters, as on /balance
+    lines = []
+    for entry_rank, entry_id, name, value in result['entries']:
+        name = name or f"<@{entry_id}>"
+        if entry_id == user_id:
+            lines.append(f"**#{entry_rank} {name}** - {format_value(value)}")
+        elif category == "wealth" and not is_banker:
+            lines.append(f"#{entry_rank} {name}")
         else:
-            embed.add_field(
-                name=f"#{i} {name}",
-                value=bank.format_currency(value),
-                inline=False
-            )
+            lines.append(f"#{entry_rank} {name} - {format_value(value)}")
+    embed.add_field(name="Nearby", value="\n".join(lines), inline=False)
+    
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
-    await interaction.response.send_message(embed=embed)  # Removed ephemeral=True to make it visible to all
 @bot.tree.command(name="use", description="Use an item from your inventory")
 async def use(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     
     # Get usable items from inventory (excluding main equipment)
-    with bank.get_db_connection() as conn:
-        c = conn.cursor()
-        c.execute('''
-            SELECT i.id, 
-                   COALESCE(s.name, r.name) as name,
-                   COALESCE(s.description, r.description) as description,
-                   COALESCE(s.category, r.category) as category,
-                   COALESCE(s.properties, r.properties) as properties
-            FROM inventory i
-            LEFT JOIN shop_items s ON i.item_id = s.id AND i.is_removed_item = 0
-            LEFT JOIN removed_shop_items r ON i.item_id = r.id AND i.is_removed_item = 1
-            WHERE i.user_id = ? 
-            AND COALESCE(s.category, r.category) NOT IN ('Wands', 'Brooms', 'Accessories')
-        ''', (user_id,))
-        
-        items = c.fetchall()
+    items = await bank.aget_usable_items(user_id)
     
     if not items:
         await interaction.response.send_message(
@@ -2495,10 +4211,10 @@ async def use(interaction: discord.Interaction):
     class ItemSelect(Select):
         def __init__(self, items):
             options = []
-            for item_id, name, description, category, _ in items:
+            for item_id, name, description, category, _, quantity in items:
                 options.append(
                     SelectOption(
-                        label=name[:100],
+                        label=(f"{name} (x{quantity})" if quantity > 1 else name)[:100],
                         value=str(item_id),
                         description=f"{category}: {description[:100] if description else 'No description'}"
                     )
@@ -2514,7 +4230,7 @@ async def use(interaction: discord.Interaction):
         async def callback(self, interaction: discord.Interaction):
             selected_id = int(self.values[0])
             selected_item = next(item for item in items if item[0] == selected_id)
-            item_id, name, description, category, properties = selected_item
+            item_id, name, description, category, properties, _ = selected_item
             
             # Create confirmation embed
             embed = Embed(
@@ -2534,11 +4250,14 @@ async def use(interaction: discord.Interaction):
                 @discord.ui.button(label="Use", style=discord.ButtonStyle.primary)
                 async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
                     try:
-                        with bank.get_db_connection() as conn:
-                            c = conn.cursor()
-                            # Remove item from inventory
-                            c.execute('DELETE FROM inventory WHERE id = ?', (item_id,))
-                            conn.commit()
+                        # Take one unit off the stack
+                        if not await bank.aremove_from_inventory(item_id):
+                            await interaction.response.edit_message(
+                                content="You no longer have this item!",
+                                embed=None,
+                                view=None
+                            )
+                            return
                         
                         # Create success embed
                         result_embed = Embed(
@@ -2568,7 +4287,7 @@ async def use(interaction: discord.Interaction):
                         log_embed.set_footer(text=f"User ID: {interaction.user.id}")
                         
                         # Send to log channel
-                        await bank.log_to_channel(bot, log_embed)
+                        bank.log_to_channel(bot, log_embed)
                         
                         await interaction.response.edit_message(
                             embed=result_embed,
@@ -2620,10 +4339,86 @@ async def use(interaction: discord.Interaction):
         ephemeral=True
     )
 
-# Load config
-with open('config.json') as f:
-    config = json.load(f)
-
-# Replace the last line with:
-bot.run(config['token'])
+@bot.tree.command(name="bank_stats", description="Show bank bot internals (Bankers only)")
+async def bank_stats(interaction: discord.Interaction):
+    if not bank.members.get(interaction.user).is_banker and interaction.user.id != bot.owner_id:
+        await interaction.response.send_message(
+            "You don't have permission to use this command!",
+            ephemeral=True
+        )
+        return
+    
+    embed = Embed(title="📊 Bank Stats", color=bank.info_color)
+    embed.add_field(
+        name="Database",
+        value=f"Pending writes: **{bank.writer.queue_depth}**\n"
+              f"Lock contention errors: **{bank.retry.contention_errors}** "
+              f"(retried **{bank.retry.retries}**, gave up **{bank.retry.gave_up}**)",
+        inline=False
+    )
+    log = bank.log_dispatcher
+    embed.add_field(
+        name="Log Channel",
+        value=f"Queued: **{log.queue_depth}**\n"
+              f"Sent: **{log.embeds_sent}** embeds in **{log.messages_sent}** messages\n"
+              f"Dropped: **{log.embeds_dropped}**\n"
+              f"Audit entries in flight: **{len(bank._audit_in_flight)}**",
+        inline=False
+    )
+    embed.add_field(
+        name="Member Tier Cache",
+        value=f"Hits: **{bank.members.hits}**, Misses: **{bank.members.misses}**",
+        inline=False
+    )
+    embed.add_field(
+        name="Cooldowns",
+        value=f"Users in memory: **{len(bank.cooldowns)}**, Loaded from database: **{bank.cooldowns.loads}**",
+        inline=False
+    )
+    embed.add_field(
+        name="Leaderboard Cache",
+        value=f"Cached: **{len(bank.leaderboards)}**, Hits: **{bank.leaderboards.hits}**, "
+              f"Misses: **{bank.leaderboards.misses}**, Invalidated: **{bank.leaderboards.invalidations}**",
+        inline=False
+    )
+    embed.add_field(
+        name="Reminders",
+        value=f"Opted in: **{len(bank.reminders.opted_in)}**, Scheduled: **{bank.reminders.pending}**\n"
+              f"Sent: **{bank.reminders.sent}**, Failed: **{bank.reminders.failed}**",
+        inline=False
+    )
+    embed.add_field(
+        name="User Locks",
+        value=f"Active: **{len(bank.user_locks)}**, Queued: **{bank.user_locks.queued}**, "
+              f"Rejected: **{bank.user_locks.rejected}**",
+        inline=False
+    )
+    embed.add_field(
+        name="Idempotency Cache",
+        value=f"Cached: **{len(bank.idempotency)}**, Duplicates answered: **{bank.idempotency.hits}**",
+        inline=False
+    )
+    responses = bank.responses
+    response_lines = [
+        f"`{command}`: ~{responses.latency.get(command, 0.0) * 1000:.0f} ms, deferred "
+        f"**{responses.deferred_predicted.get(command, 0) + responses.deferred_late.get(command, 0)}**"
+        f"/{calls} ({responses.deferred_late.get(command, 0)} by watchdog)"
+        for command, calls in sorted(responses.calls.items())
+    ]
+    embed.add_field(
+        name="Response Times",
+        value="\n".join(response_lines) or "No tracked commands yet",
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
+if __name__ == '__main__':
+    # The command handlers use this module-level instance. Importing the module (as the
+    # tests do) doesn't create it, so nothing touches config.json or bank.db
+    bank = BankSystem()
+    
+    # Load config
+    with open('config.json') as f:
+        config = json.load(f)
+    
+    bot.run(config['token'])
@@ -0,0 +1,38 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import main
+
+CONFIG = {
+    "token": "test-token",
+    "currency_emoji": {"galleon": "G", "sickle": "S", "knut": "K"},
+    "banker_roles": [111],
+    "shop_manager_roles": [222],
+    "house_emoji": {"gryffindor": "g", "slytherin": "s", "ravenclaw": "r", "hufflepuff": "h"},
+    "house_roles": {"gryffindor": 1, "slytherin": 2, "ravenclaw": 3, "hufflepuff": 4},
+    "work_roles": {"900": {"min": 1, "max": 3, "currency": "sickle"}},
+    "income_roles": {"901": {"amount": 37, "currency": "galleon"}},
+    "default_work": {"min": 30, "max": 61, "currency": "knut"},
+    "default_income": {"amount": 6, "currency": "galleon"},
+    "log_channel_id": 5,
+}
+
+
+@pytest.fixture
+def make_bank(tmp_path):
+    """Build a BankSystem on a fresh database in tmp_path (config overrides as keyword args)"""
+    def make(**overrides):
+        config_path = tmp_path / 'config.json'
+        config_path.write_text(json.dumps(dict(CONFIG, **overrides)))
+        return main.BankSystem(config_path=str(config_path), database=str(tmp_path / 'bank.db'))
+    return make
+
+
+@pytest.fixture
+def bank(make_bank):
+    return make_bank()
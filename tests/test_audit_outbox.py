@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from discord import Embed
+
+
+class Dispatcher:
+    """Stands in for LogDispatcher, reporting every embed as posted or failed"""
+    def __init__(self, delivered: bool):
+        self.delivered = delivered
+        self.attempts = []
+
+    def enqueue(self, bot, embed, on_done=None):
+        self.attempts.append(time.monotonic())
+        on_done(self.delivered)
+
+
+def pending_and_sent(bank) -> tuple:
+    return tuple(bank.safe_execute('''SELECT COUNT(*) - COUNT(sent_at), COUNT(sent_at) FROM audit_outbox''')[0])
+
+
+def test_failed_deliveries_back_off_and_are_retried(bank):
+    bank.audit_poll_interval = 0.05
+    failing = Dispatcher(delivered=False)
+    async def run():
+        bank.log_dispatcher = failing
+        await bank.run_write(bank._queue_audit, 'admin', Embed(title='Balance modified'))
+        bank.start_audit_drainer(None)
+        await asyncio.sleep(0.6)
+        # The channel comes back: the entry goes out on its next retry
+        bank.log_dispatcher = Dispatcher(delivered=True)
+        await asyncio.sleep(1.0)
+        bank._audit_task.cancel()
+    asyncio.run(run())
+
+    # Retried after 0.05, 0.1, 0.2, 0.4s rather than on every 0.05s poll
+    assert 3 <= len(failing.attempts) <= 5
+    assert failing.attempts[-1] - failing.attempts[-2] >= 0.15
+    assert bank._audit_retry == {}
+    assert pending_and_sent(bank) == (0, 1)
+
+
+def test_delivered_rows_are_pruned_after_the_retention_period(bank):
+    async def run():
+        for title in ('old', 'recent', 'pending'):
+            await bank.run_write(bank._queue_audit, 'admin', Embed(title=title))
+        await bank.run_write(lambda c: c.execute(
+            "UPDATE audit_outbox SET sent_at = datetime('now', '-8 days') WHERE id = 1"))
+        await bank.run_write(bank._mark_audit_sent, [2])
+    asyncio.run(run())
+
+    assert [row[0] for row in bank.safe_execute('SELECT id FROM audit_outbox ORDER BY id')] == [2, 3]
+    assert pending_and_sent(bank) == (1, 1)
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import main
+
+
+def test_engine_forgets_expiries_once_they_pass():
+    engine = main.CooldownEngine({'work': 100, 'income': 1000})
+    engine.load('1', {'work': 1100, 'income': None})
+
+    assert engine.remaining('1', 'work', 1000) == 100
+    assert engine.remaining('1', 'income', 1000) == 0
+    assert engine.remaining('1', 'work', 1100) == 0
+    assert engine.is_loaded('1')
+
+
+def test_engine_keeps_the_later_expiry_on_load():
+    engine = main.CooldownEngine({'work': 100})
+    engine.set('1', 'work', 2000)
+    engine.load('1', {'work': 1500})
+    assert engine.remaining('1', 'work', 1000) == 1000
+
+
+def test_superseded_expiry_does_not_clear_the_new_one():
+    engine = main.CooldownEngine({'work': 100})
+    engine.set('1', 'work', 1100)
+    engine.set('1', 'work', 1300)
+    assert engine.remaining('1', 'work', 1200) == 100
+
+
+def test_work_is_refused_until_the_cooldown_runs_out(bank):
+    now = datetime.now()
+    async def run():
+        first = await bank.aperform_work('1', 'harry', 40, 'worked', now)
+        again = await bank.aperform_work('1', 'harry', 40, 'worked', now + timedelta(seconds=60))
+        return first, again, await bank.acooldown_remaining('1', 'work')
+    first, again, remaining = asyncio.run(run())
+
+    until = int(now.timestamp()) + bank.cooldowns.durations['work']
+    assert first == (True, 40)
+    assert again == (False, until)
+    assert 0 < remaining <= bank.cooldowns.durations['work']
+
+
+def test_replay_does_not_restamp_the_cooldown(bank):
+    bank.reminders.opted_in.add(('1', 'work'))
+    now = datetime.now()
+    later = now + timedelta(seconds=100)
+    until = int(now.timestamp()) + bank.cooldowns.durations['work']
+    async def run():
+        await bank.aperform_work('1', 'harry', 40, 'worked', now, idempotency_key='work:1')
+        # Served from the idempotency cache, then from the ledger
+        cached = await bank.aperform_work('1', 'harry', 40, 'worked', later, idempotency_key='work:1')
+        bank.idempotency = main.IdempotencyCache()
+        replayed = await bank.aperform_work('1', 'harry', 40, 'worked', later, idempotency_key='work:1')
+        return cached, replayed
+    cached, replayed = asyncio.run(run())
+
+    assert cached == replayed == (True, 40)
+    assert bank.cooldowns.remaining('1', 'work', int(now.timestamp())) == until - int(now.timestamp())
+    assert bank.get_cooldowns('1')['work'] == until
+    assert bank.reminders._scheduled[('1', 'work')] == until
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def writer(tmp_path):
+    path = str(tmp_path / 'writer.db')
+    setup = sqlite3.connect(path)
+    setup.execute('CREATE TABLE t (v INTEGER)')
+    setup.commit()
+    setup.close()
+    writer = main.GroupCommitWriter(lambda: sqlite3.connect(path, check_same_thread=False))
+    writer.path = path
+    return writer
+
+
+def stored(writer) -> list:
+    conn = sqlite3.connect(writer.path)
+    try:
+        return [row[0] for row in conn.execute('SELECT v FROM t ORDER BY v')]
+    finally:
+        conn.close()
+
+
+def hold_writer(writer) -> threading.Event:
+    """Keep the writer busy until the returned event is set, so later intents share a batch"""
+    gate = threading.Event()
+    started = threading.Event()
+    def wait(c):
+        started.set()
+        gate.wait(5)
+    writer.submit(wait)
+    started.wait(5)
+    return gate
+
+
+def insert(c, value):
+    c.execute('INSERT INTO t (v) VALUES (?)', (value,))
+    return value
+
+
+def insert_then_fail(c, value):
+    insert(c, value)
+    raise ValueError('intent failed')
+
+
+def test_failed_intent_rolls_back_only_its_savepoint(writer):
+    gate = hold_writer(writer)
+    futures = [writer.submit(insert, 1), writer.submit(insert_then_fail, 2), writer.submit(insert, 3)]
+    gate.set()
+
+    assert futures[0].result(5) == 1
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+    assert futures[2].result(5) == 3
+    assert stored(writer) == [1, 3]
+
+
+def test_after_commit_runs_before_the_future_resolves(writer):
+    events = []
+    def intent(c):
+        insert(c, 1)
+        writer.after_commit(lambda: events.append(('callback', stored(writer))))
+
+    gate = hold_writer(writer)
+    future = writer.submit(intent)
+    future.add_done_callback(lambda f: events.append(('resolved', None)))
+    gate.set()
+    future.result(5)
+
+    # The callback saw the committed row, and ran before anyone was told it committed
+    assert events == [('callback', [1]), ('resolved', None)]
+
+
+def test_after_commit_of_a_failed_intent_is_dropped(writer):
+    ran = []
+    def failing(c):
+        writer.after_commit(lambda: ran.append('failed'))
+        raise ValueError('intent failed')
+    def succeeding(c):
+        writer.after_commit(lambda: ran.append('ok'))
+
+    gate = hold_writer(writer)
+    futures = [writer.submit(failing), writer.submit(succeeding)]
+    gate.set()
+
+    with pytest.raises(ValueError):
+        futures[0].result(5)
+    futures[1].result(5)
+    assert ran == ['ok']
+
+
+def test_execute_blocks_until_committed(writer):
+    assert writer.execute(insert, 7) == 7
+    assert stored(writer) == [7]
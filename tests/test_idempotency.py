@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+
+import main
+
+
+def ledger(bank, user_id: str) -> list:
+    return [tuple(row) for row in bank.safe_execute(
+        'SELECT type, amount, idempotency_key FROM transactions WHERE user_id = ? ORDER BY id', (user_id,))]
+
+
+def forget_cached_results(bank):
+    """Drop the in-memory results so a replay has to be answered from the ledger"""
+    bank.idempotency = main.IdempotencyCache()
+
+
+def test_purchase_replay_never_charges_twice(bank):
+    async def run():
+        await bank.aupdate_balance('1', 1000, 'harry')
+        item_id = await bank.aadd_shop_item('Owl', 100, 'Pets', 'A snowy owl', 'admin')
+        results = [await bank.aprocess_purchase('1', item_id, 'Pets', 100, 'Owl', idempotency_key='purchase:1')]
+        results.append(await bank.aprocess_purchase('1', item_id, 'Pets', 100, 'Owl', idempotency_key='purchase:1'))
+        forget_cached_results(bank)
+        results.append(await bank.aprocess_purchase('1', item_id, 'Pets', 100, 'Owl', idempotency_key='purchase:1'))
+        return results, await bank.aget_balance('1'), item_id
+    results, balance, item_id = asyncio.run(run())
+
+    assert results == [True, True, True]
+    assert balance == 900
+    assert bank.idempotency.hits == 0  # the cache was replaced before the last replay
+    assert [entry for entry in ledger(bank, '1') if entry[0] == 'purchase'] == [('purchase', -100, 'purchase:1')]
+    assert bank.safe_execute('SELECT quantity FROM inventory WHERE user_id = ? AND item_id = ?',
+                             ('1', item_id))[0][0] == 1
+
+
+def test_adjust_balance_replay_returns_the_first_result(bank):
+    async def run():
+        first = await bank.aadjust_balance('1', 'harry', 500, 'admin', '9', 'gift', idempotency_key='modify:1')
+        cached = await bank.aadjust_balance('1', 'harry', 500, 'admin', '9', 'gift', idempotency_key='modify:1')
+        forget_cached_results(bank)
+        replayed = await bank.aadjust_balance('1', 'harry', 500, 'admin', '9', 'gift', idempotency_key='modify:1')
+        return first, cached, replayed, await bank.aget_balance('1')
+    first, cached, replayed, balance = asyncio.run(run())
+
+    assert first == cached == replayed == (0, 500)
+    assert balance == 500
+    assert ledger(bank, '1') == [('admin', 500, 'modify:1')]
+
+
+def test_work_replay_pays_once(bank):
+    now = datetime.now()
+    async def run():
+        first = await bank.aperform_work('1', 'harry', 40, 'worked', now, idempotency_key='work:1')
+        forget_cached_results(bank)
+        replayed = await bank.aperform_work('1', 'harry', 40, 'worked', now, idempotency_key='work:1')
+        return first, replayed, await bank.aget_balance('1')
+    first, replayed, balance = asyncio.run(run())
+
+    assert first == replayed == (True, 40)
+    assert balance == 40
+    assert ledger(bank, '1') == [('work', 40, 'work:1')]
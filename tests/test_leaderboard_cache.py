@@ -0,0 +1,99 @@
+import asyncio
+
+import main
+
+
+def board(*values) -> list:
+    """(user_id, username, value) rows for users '1', '2', ... with the given values"""
+    return [(str(i), f'user{i}', value) for i, value in enumerate(values, 1)]
+
+
+def test_concurrent_misses_share_one_computation():
+    cache = main.LeaderboardCache()
+    calls = []
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return board(30, 20), 'embed'
+
+    async def run():
+        return await asyncio.gather(*(cache.get(('wealth', 'all-time'), compute) for _ in range(5)))
+    results = asyncio.run(run())
+
+    assert results == ['embed'] * 5
+    assert len(calls) == 1
+    assert (cache.misses, cache.hits) == (1, 4)
+
+
+def test_entries_are_reused_until_the_ttl_runs_out():
+    cache = main.LeaderboardCache(ttl=0.05)
+    calls = []
+    async def compute():
+        calls.append(1)
+        return board(30), f'embed{len(calls)}'
+
+    async def run():
+        first = await cache.get(('wealth', 'all-time'), compute)
+        second = await cache.get(('wealth', 'all-time'), compute)
+        await asyncio.sleep(0.06)
+        third = await cache.get(('wealth', 'all-time'), compute)
+        return first, second, third
+    assert asyncio.run(run()) == ('embed1', 'embed1', 'embed2')
+
+
+def test_invalidation_only_drops_boards_the_write_can_change():
+    cache = main.LeaderboardCache(size=2)
+    async def fill():
+        async def wealth():
+            return board(30, 20), 'wealth'
+        async def income():
+            return board(5), 'income'
+        await cache.get(('wealth', 'all-time'), wealth)
+        await cache.get(('income', 'all-time'), income)
+    asyncio.run(fill())
+
+    # Not on the full wealth board and below its lowest value: nothing changes
+    cache.invalidate('wealth', '9', 10)
+    assert len(cache) == 2
+    # Reaches the lowest value shown
+    cache.invalidate('wealth', '9', 20)
+    assert ('wealth', 'all-time') not in cache._entries
+    # A user on the board, on another metric's board
+    cache.invalidate('income', '1', 1)
+    assert len(cache) == 0
+    assert cache.invalidations == 2
+
+
+def test_write_during_computation_is_not_cached():
+    cache = main.LeaderboardCache()
+    calls = []
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return board(30), 'embed'
+
+    async def run():
+        pending = asyncio.ensure_future(cache.get(('wealth', 'all-time'), compute))
+        await asyncio.sleep(0.01)
+        cache.invalidate('wealth', '7', 1)
+        await pending
+        await cache.get(('wealth', 'all-time'), compute)
+    asyncio.run(run())
+
+    assert len(calls) == 2
+
+
+def test_committed_writes_invalidate_the_bank_leaderboards(bank):
+    async def run():
+        async def compute():
+            rows = await bank.aget_leaderboard('wealth')
+            return rows, [tuple(row) for row in rows]
+        await bank.aupdate_balance('1', 300, 'harry')
+        before = await bank.leaderboards.get(('wealth', 'all-time'), compute)
+        await bank.aupdate_balance('1', 100, 'harry')
+        after = await bank.leaderboards.get(('wealth', 'all-time'), compute)
+        return before, after
+    before, after = asyncio.run(run())
+
+    assert before == [('1', 'harry', 300)]
+    assert after == [('1', 'harry', 400)]
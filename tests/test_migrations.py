@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+
+@pytest.fixture
+def conn(bank):
+    """Autocommit connection with a ledger of 200 transactions across users and days"""
+    conn = bank.pool.create_connection()
+    conn.isolation_level = None
+    rng = random.Random(7)
+    conn.executemany('''INSERT INTO transactions (user_id, amount, type, timestamp)
+                        VALUES (?, ?, ?, datetime('now', ?))''',
+                     [(str(i % 6), rng.randint(1, 500), rng.choice(['income', 'work', 'purchase']),
+                       f'-{rng.randint(0, 40)} days') for i in range(200)])
+    yield conn
+    conn.close()
+
+
+def small_chunks(bank, monkeypatch, chunk_size: int = 7):
+    in_rowid_chunks = bank._in_rowid_chunks
+    monkeypatch.setattr(bank, '_in_rowid_chunks',
+                        lambda conn, table, sql, params=(): in_rowid_chunks(conn, table, sql, params, chunk_size))
+
+
+def test_fresh_database_reaches_the_latest_version(bank, conn):
+    assert bank._get_db_version(conn) == bank.migrations()[-1][0]
+
+
+def test_user_stats_backfill_matches_the_ledger_and_can_rerun(bank, conn, monkeypatch):
+    small_chunks(bank, monkeypatch)
+    expected = sorted(tuple(row) for row in conn.execute(
+        '''SELECT user_id, COUNT(*), COALESCE(SUM(CASE WHEN type = 'income' THEN amount END), 0)
+           FROM transactions GROUP BY user_id'''))
+
+    for _ in range(2):
+        bank._migrate_user_stats(conn)
+        assert sorted(tuple(row) for row in conn.execute('SELECT * FROM user_stats')) == expected
+
+
+def test_ledger_rollups_backfill_matches_the_ledger_and_can_rerun(bank, conn, monkeypatch):
+    small_chunks(bank, monkeypatch)
+    expected = sorted(tuple(row) for row in conn.execute(
+        '''SELECT CAST(strftime('%s', timestamp) AS INTEGER) / 86400, user_id, COUNT(*),
+                  COALESCE(SUM(CASE WHEN type = 'income' THEN amount END), 0)
+           FROM transactions GROUP BY 1, user_id'''))
+
+    for _ in range(2):
+        bank._migrate_ledger_rollups(conn)
+        assert sorted(tuple(row) for row in conn.execute('SELECT * FROM ledger_rollups')) == expected
+
+
+def test_chunks_commit_separately(bank, conn):
+    commits = []
+    conn.set_trace_callback(lambda sql: commits.append(sql) if sql == 'COMMIT' else None)
+    bank._in_rowid_chunks(conn, 'transactions', 'UPDATE transactions SET details = ? WHERE rowid > ? AND rowid <= ?',
+                          ('backfilled',), chunk_size=50)
+    assert len(commits) == 4
+    assert conn.execute("SELECT COUNT(*) FROM transactions WHERE details = 'backfilled'").fetchone()[0] == 200
@@ -0,0 +1,98 @@
+"""EXPLAIN every SQL statement in main.py against a freshly migrated database.
+
+Hot-path statements must be index-backed: a plan that falls back to a full table SCAN
+fails unless its function is listed in SCAN_ALLOWED. f-string SQL is expanded with each
+binding in BINDINGS, and SQL that can't be expanded fails unless listed in UNCHECKED.
+"""
+import ast
+
+import main
+
+# Functions whose statements may scan: migrations and deliberate whole-table reads
+SCAN_ALLOWED = {
+    '_migrate_base_schema', '_migrate_balance_knuts', '_migrate_hot_query_indexes',
+    '_migrate_unified_catalog', '_migrate_inventory_quantity', '_migrate_audit_outbox',
+    '_migrate_idempotency_keys', '_migrate_cooldown_expiries', '_migrate_cooldown_reminders',
+    '_migrate_user_stats', '_migrate_ledger_rollups', '_migrate_audit_pruning',
+    '_in_rowid_chunks', '_backfill_in_chunks', '_get_db_version',
+    'get_catalog_rows', 'get_reminder_rows', 'get_rank_rows',
+}
+
+# Values that f-string SQL is built from, per function; each binding is EXPLAINed
+BINDINGS = {
+    '_perform_cooldown_credit': [{'column': column} for column in main.CooldownEngine.COLUMNS.values()],
+    '_set_reminder': [{'column': column} for column in main.CooldownEngine.REMINDER_COLUMNS.values()],
+    'get_leaderboard': [{'column': 'transaction_count'}, {'column': 'income'}],
+}
+
+# Functions that run SQL handed to them by the caller, so there's nothing to EXPLAIN
+UNCHECKED = {'safe_execute'}
+
+DML = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+
+def collect_statements(source_path: str) -> tuple:
+    """Return ([(function, line, sql)], [(function, line)] of SQL that couldn't be expanded)"""
+    with open(source_path, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+
+    statements = []
+    skipped = []
+    def expand(func_name, line, sql):
+        if isinstance(sql, ast.Constant) and isinstance(sql.value, str):
+            statements.append((func_name, line, sql.value))
+            return
+        if isinstance(sql, ast.JoinedStr):
+            head = sql.values[0]
+            if isinstance(head, ast.Constant) and not head.value.lstrip().upper().startswith(DML):
+                return  # DDL and PRAGMAs, same as their literal counterparts
+            names = {ast.unparse(v.value) for v in sql.values if isinstance(v, ast.FormattedValue)}
+            bindings = BINDINGS.get(func_name, [])
+            if bindings and all(names <= binding.keys() for binding in bindings):
+                for binding in bindings:
+                    statements.append((func_name, line, ''.join(
+                        v.value if isinstance(v, ast.Constant) else str(binding[ast.unparse(v.value)])
+                        for v in sql.values)))
+                return
+        skipped.append((func_name, line))
+
+    def collect(node, func_name):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                collect(child, child.name)
+                continue
+            # writer.execute() takes a write intent, not SQL
+            if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                    and child.func.attr == 'execute' and child.args
+                    and not (isinstance(child.func.value, ast.Attribute) and child.func.value.attr == 'writer')):
+                expand(func_name, child.lineno, child.args[0])
+            collect(child, func_name)
+    collect(tree, '<module>')
+    return statements, skipped
+
+
+def test_all_sql_is_checked():
+    _, skipped = collect_statements(main.__file__)
+    unchecked = [(func_name, line) for func_name, line in skipped
+                 if func_name not in SCAN_ALLOWED | UNCHECKED]
+    assert not unchecked, f"SQL the plan check can't expand (add it to BINDINGS): {unchecked}"
+
+
+def test_hot_queries_are_index_backed(bank):
+    statements, _ = collect_statements(main.__file__)
+    problems = []
+    checked = 0
+    with bank.get_db_connection() as conn:
+        for func_name, line, sql in statements:
+            verb = sql.lstrip().split(None, 1)[0].upper()
+            if func_name in SCAN_ALLOWED or verb not in DML:
+                continue
+            checked += 1
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, (None,) * sql.count('?')).fetchall()
+            for row in plan:
+                detail = row[3]
+                if detail.startswith('SCAN') and detail != 'SCAN CONSTANT ROW':
+                    problems.append((func_name, line, detail))
+
+    assert checked > 40
+    assert not problems, f"Full table scans: {problems}"
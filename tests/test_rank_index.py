@@ -0,0 +1,51 @@
+import asyncio
+
+import main
+
+
+def test_ranks_follow_updates():
+    ranks = main.RankIndex()
+    ranks.load([('1', 'harry', 300, 0, 0), ('2', 'ron', 100, 0, 0), ('3', 'hermione', 200, 0, 0)])
+    assert ranks.rank('wealth', '2')['rank'] == 3
+
+    ranks.update('wealth', '2', 500)
+    result = ranks.rank('wealth', '2')
+    assert (result['rank'], result['total'], result['value']) == (1, 3, 500)
+    assert [entry[1] for entry in result['entries']] == ['2', '1', '3']
+
+
+def test_zero_value_drops_off_the_metric():
+    ranks = main.RankIndex()
+    ranks.load([('1', 'harry', 300, 0, 0), ('2', 'ron', 100, 0, 0)])
+    ranks.update('wealth', '1', 0)
+    assert ranks.rank('wealth', '1') is None
+    assert ranks.rank('wealth', '2')['total'] == 1
+
+
+def test_ties_are_ordered_by_user_id_and_neighbours_are_bounded():
+    ranks = main.RankIndex()
+    ranks.load([(str(i), f'user{i}', 100, 0, 0) for i in range(1, 8)])
+    result = ranks.rank('wealth', '4', neighbours=2)
+    assert result['rank'] == 4
+    assert [entry[0] for entry in result['entries']] == [2, 3, 4, 5, 6]
+
+
+def test_committed_writes_move_the_bank_ranks(bank):
+    async def run():
+        await bank.aupdate_balance('1', 300, 'harry')
+        await bank.aupdate_balance('2', 100, 'ron')
+        await bank.aadjust_balance('2', 'ron', 500, 'admin', '9', 'gift')
+        await bank.aupdate_username('2', 'ronald')
+    asyncio.run(run())
+
+    result = bank.ranks.rank('wealth', '2')
+    assert (result['rank'], result['value']) == (1, 600)
+    assert result['entries'][0][2] == 'ronald'
+    assert bank.ranks.rank('transactions', '2')['value'] == 1
+
+    # The in-memory index agrees with a fresh load from the database
+    fresh = main.RankIndex()
+    fresh.load(bank.get_rank_rows())
+    for metric in main.RankIndex.METRICS:
+        for user_id in ('1', '2'):
+            assert bank.ranks.rank(metric, user_id) == fresh.rank(metric, user_id)
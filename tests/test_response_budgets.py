@@ -0,0 +1,66 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+import main
+
+
+class Response:
+    def __init__(self, fail_defer: bool = False):
+        self.fail_defer = fail_defer
+        self.sent = []
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, **kwargs):
+        if self.fail_defer:
+            raise discord.NotFound(SimpleNamespace(status=404, reason='Not Found'), 'Unknown interaction')
+        self._done = True
+
+    async def send_message(self, *args, **kwargs):
+        self._done = True
+        self.sent.append(('response', args))
+
+
+class Followup:
+    def __init__(self, response):
+        self.response = response
+
+    async def send(self, *args, **kwargs):
+        self.response.sent.append(('followup', args))
+
+
+def interaction(fail_defer: bool = False):
+    response = Response(fail_defer)
+    return SimpleNamespace(response=response, followup=Followup(response))
+
+
+def test_predicted_slow_command_is_deferred_and_answered_as_followup():
+    budgets = main.ResponseBudgets({'default': 1.0})
+    budgets.latency['slow'] = 5.0
+    target = interaction()
+
+    async def run():
+        async with budgets.track(target, 'slow') as reply:
+            await reply.send('done')
+    asyncio.run(run())
+
+    assert budgets.deferred_predicted == {'slow': 1}
+    assert target.response.sent == [('followup', ('done',))]
+
+
+def test_failed_up_front_defer_falls_through_to_a_normal_reply():
+    budgets = main.ResponseBudgets({'default': 1.0})
+    budgets.latency['slow'] = 5.0
+    target = interaction(fail_defer=True)
+
+    async def run():
+        async with budgets.track(target, 'slow') as reply:
+            await reply.send('done')
+    asyncio.run(run())
+
+    assert budgets.deferred_predicted == {}
+    assert target.response.sent == [('response', ('done',))]
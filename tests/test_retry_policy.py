@@ -0,0 +1,121 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import main
+
+
+def hold_write_lock(bank, seconds: float) -> threading.Timer:
+    """Take the write lock from a second connection and release it after `seconds`"""
+    blocker = bank.pool.create_connection()
+    blocker.isolation_level = None
+    blocker.execute('BEGIN IMMEDIATE')
+    def release():
+        blocker.execute('ROLLBACK')
+        blocker.close()
+    timer = threading.Timer(seconds, release)
+    timer.start()
+    return timer
+
+
+def test_write_retries_through_a_held_lock(bank):
+    timer = hold_write_lock(bank, 0.25)
+    started = time.monotonic()
+    bank.writer.execute(lambda c: None)
+    elapsed = time.monotonic() - started
+    timer.join()
+
+    assert bank.retry.retries > 0
+    assert bank.retry.gave_up == 0
+    assert elapsed < 2.0
+
+
+def test_async_write_backs_off_with_asyncio_sleep(bank):
+    async def run():
+        ticks = 0
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        task = asyncio.create_task(ticker())
+        timer = hold_write_lock(bank, 0.25)
+        await bank.run_write(lambda c: None)
+        task.cancel()
+        timer.join()
+        return ticks
+
+    ticks = asyncio.run(run())
+    assert bank.retry.retries > 0
+    # The event loop kept running while the write waited for the lock
+    assert ticks > 5
+
+
+class Flaky:
+    """Raises `error` for the first `failures` calls, then returns 'ok'"""
+    def __init__(self, failures: int, error: Exception = None):
+        self.failures = failures
+        self.error = error or sqlite3.OperationalError('database is locked')
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return 'ok'
+
+
+def test_contention_is_retried_until_it_clears():
+    policy = main.RetryPolicy(base_delay=0.001)
+    call = Flaky(3)
+    assert policy.run_sync('write', call) == 'ok'
+    assert (call.calls, policy.retries, policy.gave_up) == (4, 3, 0)
+
+
+def test_attempt_cap_ends_retries():
+    policy = main.RetryPolicy(base_delay=0.001, budgets={'write': (3, 10.0)})
+    call = Flaky(100)
+    with pytest.raises(sqlite3.OperationalError):
+        policy.run_sync('write', call)
+    assert (call.calls, policy.retries, policy.gave_up) == (3, 2, 1)
+
+
+def test_deadline_ends_retries():
+    policy = main.RetryPolicy(base_delay=0.02, max_delay=0.02, budgets={'write': (1000, 0.2)})
+    call = Flaky(10000)
+    started = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError):
+        policy.run_sync('write', call)
+    assert time.monotonic() - started <= 0.3
+    assert call.calls < 1000
+
+
+def test_default_write_budget_is_bounded_by_its_deadline():
+    # The attempt cap is only a backstop: using up every attempt (busy wait plus the mean
+    # jittered backoff) takes longer than the deadline
+    max_attempts, deadline = main.RetryPolicy.BUDGETS['write']
+    policy = main.RetryPolicy()
+    busy_timeout = main.ConnectionPool('unused.db').busy_timeout
+    expected = sum(busy_timeout + min(policy.max_delay, policy.base_delay * 2 ** attempt) / 2
+                   for attempt in range(max_attempts - 1))
+    assert expected > deadline
+
+
+def test_other_errors_are_not_retried():
+    policy = main.RetryPolicy(base_delay=0.001)
+    call = Flaky(1, sqlite3.OperationalError('no such table: users'))
+    with pytest.raises(sqlite3.OperationalError):
+        policy.run_sync('read', call)
+    assert (call.calls, policy.retries, policy.contention_errors) == (1, 0, 0)
+
+
+def test_async_run_retries_with_fresh_awaitables():
+    policy = main.RetryPolicy(base_delay=0.001)
+    call = Flaky(2)
+    async def make_call():
+        return call()
+    assert asyncio.run(policy.run('read', make_call)) == 'ok'
+    assert call.calls == 3